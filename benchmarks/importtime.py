@@ -0,0 +1,137 @@
+#! /usr/bin/env python3
+""" Import time benchmark
+
+Measures cold import time of Shift2Me entry modules with `python -X importtime` (Python >= 3.7),
+and checks that heavy dependencies loaded on first use (pandas, matplotlib) are not imported at start up.
+
+Usage, from repository root :
+    python3 benchmarks/importtime.py [--repeat N] [--save results.json]
+    python3 benchmarks/importtime.py --baseline results.json [--tolerance 0.2]
+
+Exits with status 1 if a lazily imported dependency is loaded at start up,
+or with `--baseline`, if a target got slower than its baseline time by more than `tolerance`.
+Exits with status 2 if a target could not be imported, e.g missing PyQt5 or cmd2,
+unless `--allow-skipped` is given.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from collections import OrderedDict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# name : (path added to PYTHONPATH, imported module, modules which must not be imported)
+TARGETS = OrderedDict([
+    ('shell titration', ('package', 'classes.Titration', ('pandas', 'matplotlib'))),
+    ('shell', ('package', 'classes.command', ('pandas', 'matplotlib'))),
+    ('gui titration', ('.', 'package.classes.Titration', ('pandas', 'matplotlib'))),
+    ('gui models', ('.', 'package.models.DataFrameModel', ('pandas', 'matplotlib'))),
+    ('gui', ('.', 'package.shift2me', ('pandas', 'matplotlib'))),
+])
+
+
+def parse_importtime(output):
+    """
+    Parses `-X importtime` output.
+    Returns list of (module, self time, cumulative time) tuples, times in seconds.
+    """
+    imports = []
+    for line in output.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        try:
+            selfTime, cumulative = int(fields[0]), int(fields[1])
+        except ValueError: # header line
+            continue
+        imports.append((fields[2].strip(), selfTime / 1e6, cumulative / 1e6))
+    return imports
+
+
+def measure(path, module):
+    "Imports `module` in a fresh interpreter, returns list of imports or raises RuntimeError"
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.path.join(ROOT, path), env.get('PYTHONPATH')]))
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import {module}'.format(module=module)],
+                             cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True)
+    if process.returncode:
+        lines = process.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else "exit status {code}".format(code=process.returncode))
+    return parse_importtime(process.stderr)
+
+
+def run_target(path, module, lazyModules, repeat):
+    """
+    Returns (best total import time, heaviest imports, eagerly imported lazy modules) of `module`,
+    over `repeat` runs.
+    """
+    best = None
+    for _ in range(repeat):
+        imports = measure(path, module)
+        total = next(cumulative for name, selfTime, cumulative in imports if name == module)
+        if best is None or total < best[0]:
+            best = (total, imports)
+    total, imports = best
+    heaviest = sorted(imports, key=lambda item: item[1], reverse=True)[:5]
+    loaded = set(name for name, selfTime, cumulative in imports)
+    eager = [lazy for lazy in lazyModules if lazy in loaded]
+    return total, heaviest, eager
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure Shift2Me import times.")
+    parser.add_argument('--repeat', type=int, default=5, help="runs per target, best time is kept")
+    parser.add_argument('--save', help="save results as JSON to this path")
+    parser.add_argument('--baseline', help="JSON results to compare with")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed relative slow down")
+    parser.add_argument('--allow-skipped', action='store_true', help="succeed when some targets cannot be imported")
+    parser.add_argument('targets', nargs='*', help="targets to measure among {targets}, default all".format(
+        targets=", ".join(TARGETS)))
+    args = parser.parse_args(argv)
+    for name in args.targets:
+        if name not in TARGETS:
+            parser.error("unknown target {name}".format(name=name))
+
+    baseline = dict()
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+
+    results = OrderedDict()
+    failed = False
+    skipped = []
+    for name in args.targets or TARGETS:
+        path, module, lazyModules = TARGETS[name]
+        try:
+            total, heaviest, eager = run_target(path, module, lazyModules, args.repeat)
+        except RuntimeError as error:
+            skipped.append(name)
+            print("{name:<16} SKIPPED, import failed : {error}".format(name=name, error=error))
+            continue
+        results[name] = total
+        print("{name:<16} {time:8.1f} ms\t({module})".format(name=name, time=total * 1e3, module=module))
+        for importName, selfTime, cumulative in heaviest:
+            print("{indent:<16} {time:8.1f} ms\t  {module}".format(indent='', time=selfTime * 1e3, module=importName))
+        if eager:
+            failed = True
+            print("{indent:<16} eagerly imported : {modules}".format(indent='', modules=", ".join(eager)))
+        if name in baseline and total > baseline[name] * (1 + args.tolerance):
+            failed = True
+            print("{indent:<16} regression : {time:.1f} ms in baseline".format(indent='', time=baseline[name] * 1e3))
+
+    if args.save:
+        with open(args.save, 'w') as fh:
+            json.dump(results, fh, indent=4)
+    if skipped:
+        print("{count} target(s) skipped, not measured : {names}".format(count=len(skipped), names=", ".join(skipped)))
+    if failed:
+        return 1
+    return 2 if skipped and not args.allow_skipped else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
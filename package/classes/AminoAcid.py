@@ -6,118 +6,134 @@ Authors : Hermès PARAQUINDES, Louis Duchemin, Marc-Antoine GUENY and Rainier-Nu
 
 
 
-import math
 import sys
 
+import numpy as np
+
 
 class AminoAcid(object):
     """
     Class AminoAcid
     Describes a amino-acid using its position number in the proteic sequence.
-    An AminoAcid object contains the values of measured chemical shift at each titration step.
-    These data are split in two lists, one contains the hydrogen chem shift data, the other contains nitrogen chem shifts data.
-    The first element of each list is used as a reference value for calculating difference in chemical shifts at each titration step, i.e measured chem shift - ref chem shift.
+    An AminoAcid object is a lightweight view on a column of a ChemshiftTable,
+    which holds the values of measured chemical shift at each titration step.
+    Hydrogen and nitrogen chem shifts are exposed as arrays of measured values,
+    read-only views on table columns when no step is missing.
+    The first element of each array is used as a reference value for calculating difference in chemical shifts at each titration step, i.e measured chem shift - ref chem shift.
+    Nothing is cached per residue, intensities are read from the table which computes them for all residues at once.
     """
 
-    def __init__(self, **kwargs):
+    __slots__ = ('table', 'position', 'code')
+
+    def __init__(self, table, position, code=None):
         """
-        Initialize AminoAcid object, only required argument is position.
-        If chemshiftH and chemshiftN are provided, use them to start both chemical shift lists.
+        Initialize AminoAcid view on `table` column for residue at `position`.
         """
-        self.position = int(kwargs["position"])
-        self.chemshiftH = [float(kwargs["chemshiftH"])] if kwargs.get("chemshiftH") else []
-        self.chemshiftN = [float(kwargs["chemshiftN"])] if kwargs.get("chemshiftN") else []
-        self._deltaChemshiftH = None
-        self._deltaChemshiftN = None
-        self._chemshiftIntensity = None
-        self.code = kwargs.get('code')
+        self.table = table
+        self.position = int(position)
+        self.code = code
 
     def __str__(self):
-        return str((self.position, self.chemshiftH, self.chemshiftN))
+        return str((self.position, list(self.chemshiftH), list(self.chemshiftN)))
 
     def __repr__(self):
         return self.__str__()
 
-    def add_chemshifts(self, **kwargs):
-        """
-        Append chemical shifts to object's lists of chemical shifts
-        If one of the values is missing, None or 0, it is ignored.
-        """
-        if kwargs.get("chemshiftH") and float(kwargs["chemshiftH"]) != 0:
-            self.chemshiftH.append(float(kwargs["chemshiftH"]))
-        if kwargs.get("chemshiftN") and float(kwargs["chemshiftN"]) != 0:
-            self.chemshiftN.append(float(kwargs["chemshiftN"]))
-
     def validate(self, titrationSteps):
         """
         Checks wether an AminoAcid object contains all chemical shift data (1 for each titration step)
         """
-        return True if len(self.chemshiftH) == len(self.chemshiftN) == titrationSteps else False
+        return titrationSteps == self.table.steps and bool(self.table.valid[:, self.column].all())
+
+    def _measured(self, values):
+        "Measured values of this residue in (steps x residues) table `values`, without copy if no step is missing"
+        column = self.column
+        validSteps = self.table.valid[:, column]
+        if validSteps.all():
+            measured = values[:, column]
+            # table data must not be modified through residue views
+            measured.flags.writeable = False
+            return measured
+        return values[validSteps, column]
 
 ## -----------------------------------------------------------
 ##      PROPERTIES
 ## -----------------------------------------------------------
 
+    @property
+    def column(self):
+        "Column index of this residue in underlying table"
+        return self.table.column(self.position)
+
+    @property
+    def chemshiftH(self):
+        "Array of measured hydrogen chem shifts"
+        return self._measured(self.table.chemshiftH)
+
+    @property
+    def chemshiftN(self):
+        "Array of measured nitrogen chem shifts"
+        return self._measured(self.table.chemshiftN)
+
     @property
     def deltaChemshiftH(self):
         """
-        Calculates distance to the reference for each chemical shift only once for hydrogen.
+        Calculates distance to the reference for each chemical shift for hydrogen.
         """
-        try :
-            self._deltaChemshiftH = tuple([dH - self.chemshiftH[0] for dH in self.chemshiftH])
-            return self._deltaChemshiftH
-        except IndexError as missingDataError:
-            sys.stderr.write("Could not calculate chem shift variation for residue %s : missing H chem shift data" % self.position)
-            exit(1)
-
+        return self._delta(self.chemshiftH, 'H')
 
     @property
     def deltaChemshiftN(self):
         """
-        Calculates distance to the reference for each chemical shift only once for nitrogen.
+        Calculates distance to the reference for each chemical shift for nitrogen.
         """
-        try:
-            self._deltaChemshiftN = tuple([dN - self.chemshiftN[0] for dN in self.chemshiftN])
-            return self._deltaChemshiftN
-        except IndexError as missingDataError:
-            sys.stderr.write("Could not calculate chem shift variation for residue %s : missing N chem shift data" % self.position)
+        return self._delta(self.chemshiftN, 'N')
+
+    def _delta(self, chemshifts, atom):
+        if not len(chemshifts):
+            sys.stderr.write("Could not calculate chem shift variation for residue %s : missing %s chem shift data" % (self.position, atom))
             exit(1)
+        return chemshifts - chemshifts[0]
 
     @property
     def deltaChemshifts(self):
         """
-        Returns a tuple of deltaChemshifts as tuple like (deltaH, deltaN)
+        Returns array of (deltaH, deltaN) pairs for each titration step
         """
-        return tuple(zip(self.deltaChemshiftH, self.deltaChemshiftN))
+        return np.column_stack((self.deltaChemshiftH, self.deltaChemshiftN))
 
     @property
     def chemshift(self):
-        "Tuple of tuples (chem shift H, chem shift N) for each titration step"
-        return tuple(zip(self.chemshiftH,self.chemshiftN))
+        "Array of (chem shift H, chem shift N) pairs for each titration step"
+        return np.column_stack((self.chemshiftH, self.chemshiftN))
 
     @property
     def chemshiftIntensity(self):
         """
-        Calculate chemical shift intensity at each titration step from chemical shift values for hydrogen and nitrogen.
+        Chemical shift intensity at each titration step from chemical shift values for hydrogen and nitrogen,
+        using table intensity engine parameters.
+        Read from table intensities, computed only if reference step is missing.
         """
-        self._chemshiftIntensity = tuple([math.sqrt(ddH**2 + (ddN/5)**2) for (ddH, ddN) in self.deltaChemshifts])
-        return self._chemshiftIntensity
+        if self.table.valid[0, self.column]:
+            return self._measured(self.table.intensities)
+        return self.table.engine.compute(self.deltaChemshiftH, self.deltaChemshiftN, np.array([self.position]))
 
 
     @property
     def arrow(self):
         "Chem shift vector start/end coords calculated on first and last step chem shift data"
-        return (self.chemshiftH[0],
-                self.chemshiftN[0],
-                self.chemshiftH[-1] - self.chemshiftH[0],
-                self.chemshiftN[-1] - self.chemshiftN[0])
+        chemshiftH, chemshiftN = self.chemshiftH, self.chemshiftN
+        return (chemshiftH[0],
+                chemshiftN[0],
+                chemshiftH[-1] - chemshiftH[0],
+                chemshiftN[-1] - chemshiftN[0])
 
     @property
     def rangeH(self):
         "Distance between max and min H chem shift"
-        return max(self.chemshiftH) - min(self.chemshiftH)
+        return np.ptp(self.chemshiftH)
 
     @property
     def rangeN(self):
         "Distance between max and min N chem shift"
-        return max(self.chemshiftN) - min(self.chemshiftN)
+        return np.ptp(self.chemshiftN)
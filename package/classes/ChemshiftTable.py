@@ -0,0 +1,257 @@
+""" ChemshiftTable class module
+
+Columnar storage for chemical shifts measured along a titration.
+Data is held in (steps x residues) float arrays for hydrogen and nitrogen,
+with a boolean mask flagging which cells contain measured values.
+Residue columns are kept sorted by position.
+"""
+
+import numpy as np
+
+from .intensity import IntensityEngine
+
+class ChemshiftTable(object):
+    """
+    Class ChemshiftTable.
+    Rows are titration steps, columns are residues sorted by position.
+    Row storage grows geometrically so that appending a step is amortized O(residues).
+    Intensities and the complete residues mask are maintained incrementally,
+    only the rows affected by a change are recomputed.
+    Intensity rows are computed on first access, so that a read-only table backed by
+    memory-mapped arrays only reads the steps it is asked for,
+    and are recomputed whenever intensity engine parameters change.
+    `version` is incremented on each change, allowing views to invalidate derived data.
+    """
+
+    def __init__(self, capacity=8, engine=None):
+        self.positions = np.empty(0, dtype=np.int64)
+        self._chemshiftH = np.full((capacity, 0), np.nan)
+        self._chemshiftN = np.full((capacity, 0), np.nan)
+        self._valid = np.zeros((capacity, 0), dtype=bool)
+        self._intensities = np.full((capacity, 0), np.nan)
+        self._intensityRows = np.zeros(capacity, dtype=bool) # up to date intensity rows
+        self._complete = np.zeros(0, dtype=bool)
+        self.steps = 0
+        self.version = 0 # incremented on each data change
+        self.readonly = False
+        self.engine = engine or IntensityEngine()
+        self._engineVersion = self.engine.version # engine parameters used for cached intensities
+
+    @classmethod
+    def from_arrays(cls, positions, chemshiftH, chemshiftN, valid, readonly=False, engine=None):
+        """
+        Build table from (residues) positions and (steps x residues) chem shifts and mask arrays.
+        Arrays are used without copy, e.g memory-mapped arrays. Use `readonly` to forbid changes.
+        """
+        self = cls(capacity=0, engine=engine)
+        self.positions = np.asarray(positions, dtype=np.int64)
+        self._chemshiftH = np.asarray(chemshiftH, dtype=np.float64)
+        self._chemshiftN = np.asarray(chemshiftN, dtype=np.float64)
+        self._valid = np.asarray(valid, dtype=bool)
+        # rows are only filled on demand
+        self._intensities = np.empty(self._valid.shape)
+        self._intensityRows = np.zeros(len(self._valid), dtype=bool)
+        self.steps = len(self._valid)
+        self.readonly = readonly
+        self._complete = self._valid.all(axis=0) if self.steps else np.zeros(len(self.positions), dtype=bool)
+        return self
+
+    def __len__(self):
+        return len(self.positions)
+
+    def __contains__(self, position):
+        index = np.searchsorted(self.positions, position)
+        return index < len(self.positions) and self.positions[index] == position
+
+## ---------------------------------------------
+##      Storage management
+## ---------------------------------------------
+
+    def column(self, position):
+        "Returns column index of residue at `position`. Raises KeyError if unknown."
+        index = int(np.searchsorted(self.positions, position))
+        if index >= len(self.positions) or self.positions[index] != position:
+            raise KeyError(position)
+        return index
+
+    def columns(self, positions):
+        "Returns column indexes for an array of known positions"
+        return np.searchsorted(self.positions, positions)
+
+    def position_range(self, start=None, stop=None):
+        """
+        Sorted array of known positions in [`start`, `stop`) range, found by binary search.
+        Open bounds (None) extend to first/last position.
+        """
+        first = 0 if start is None else int(np.searchsorted(self.positions, start))
+        last = len(self.positions) if stop is None else int(np.searchsorted(self.positions, stop))
+        return self.positions[first:max(first, last)]
+
+    def missing_positions(self):
+        "Sorted array of positions missing between first and last known positions"
+        if len(self.positions) < 2 or self.positions[-1] - self.positions[0] + 1 == len(self.positions):
+            # columns are contiguous
+            return np.empty(0, dtype=np.int64)
+        gaps = np.flatnonzero(np.diff(self.positions) > 1)
+        return np.concatenate([np.arange(self.positions[gap] + 1, self.positions[gap + 1], dtype=np.int64)
+                               for gap in gaps])
+
+    def add_positions(self, positions):
+        """
+        Insert empty columns for positions not yet in table, keeping columns sorted.
+        Returns array of newly inserted positions.
+        """
+        self._check_writable()
+        newPositions = np.setdiff1d(np.asarray(positions, dtype=np.int64), self.positions)
+        if len(newPositions):
+            insertAt = np.searchsorted(self.positions, newPositions)
+            self.positions = np.insert(self.positions, insertAt, newPositions)
+            self._chemshiftH = np.insert(self._chemshiftH, insertAt, np.nan, axis=1)
+            self._chemshiftN = np.insert(self._chemshiftN, insertAt, np.nan, axis=1)
+            self._valid = np.insert(self._valid, insertAt, False, axis=1)
+            self._intensities = np.insert(self._intensities, insertAt, np.nan, axis=1)
+            # new residues have no data for previous steps
+            self._complete = np.insert(self._complete, insertAt, self.steps == 0)
+            self.version += 1
+        return newPositions
+
+    def reserve(self, steps):
+        "Ensure row storage can hold at least `steps` titration steps"
+        capacity = len(self._valid)
+        if steps <= capacity:
+            return
+        capacity = max(steps, 2 * capacity)
+        grow = capacity - len(self._valid)
+        width = len(self.positions)
+        self._chemshiftH = np.vstack((self._chemshiftH, np.full((grow, width), np.nan)))
+        self._chemshiftN = np.vstack((self._chemshiftN, np.full((grow, width), np.nan)))
+        self._valid = np.vstack((self._valid, np.zeros((grow, width), dtype=bool)))
+        self._intensities = np.vstack((self._intensities, np.full((grow, width), np.nan)))
+        self._intensityRows = np.concatenate((self._intensityRows, np.zeros(grow, dtype=bool)))
+
+    def add_step(self, positions, chemshiftH, chemshiftN):
+        """
+        Append a titration step from parallel arrays of positions and chem shifts.
+        Zero or NaN chem shifts are considered as missing data.
+        Returns array of positions which were complete before this step and are not anymore.
+        """
+        self._check_writable()
+        positions = np.asarray(positions, dtype=np.int64)
+        chemshiftH = np.asarray(chemshiftH, dtype=np.float64)
+        chemshiftN = np.asarray(chemshiftN, dtype=np.float64)
+        self.add_positions(positions)
+        self.reserve(self.steps + 1)
+        columns = self.columns(positions)
+        step = self.steps
+        self._chemshiftH[step, columns] = chemshiftH
+        self._chemshiftN[step, columns] = chemshiftN
+        self._valid[step, columns] = ((chemshiftH != 0) & (chemshiftN != 0)
+                                      & ~np.isnan(chemshiftH) & ~np.isnan(chemshiftN))
+        self.steps += 1
+        self.version += 1
+        # update complete residues using new step only
+        lost = self._complete & ~self._valid[step]
+        self._complete &= self._valid[step]
+        return self.positions[lost]
+
+    def replace_step(self, step, positions, chemshiftH, chemshiftN):
+        """
+        Replace data of an existing titration `step`, e.g when its file changed.
+        Returns array of column indexes which complete state changed.
+        """
+        self._check_writable()
+        positions = np.asarray(positions, dtype=np.int64)
+        chemshiftH = np.asarray(chemshiftH, dtype=np.float64)
+        chemshiftN = np.asarray(chemshiftN, dtype=np.float64)
+        self.add_positions(positions)
+        columns = self.columns(positions)
+        self._chemshiftH[step] = np.nan
+        self._chemshiftN[step] = np.nan
+        self._valid[step] = False
+        self._chemshiftH[step, columns] = chemshiftH
+        self._chemshiftN[step, columns] = chemshiftN
+        self._valid[step, columns] = ((chemshiftH != 0) & (chemshiftN != 0)
+                                      & ~np.isnan(chemshiftH) & ~np.isnan(chemshiftN))
+        # residues may become complete again, full check is required
+        complete = self.valid.all(axis=0)
+        changed = np.flatnonzero(complete != self._complete)
+        self._complete = complete
+        self.version += 1
+        if step == 0:
+            self._intensityRows[:] = False
+        else:
+            self._intensityRows[step] = False
+        return changed
+
+    def set_engine(self, engine):
+        "Use intensity `engine`, discarding cached intensities"
+        self.engine = engine
+        self._intensityRows[:] = False
+        self._engineVersion = engine.version
+        self.version += 1
+
+    def intensity_row(self, step):
+        "Chem shift intensities of all residues at `step`, NaN where missing"
+        step = step if step >= 0 else self.steps + step
+        self._update_intensities([step])
+        return self._intensities[step]
+
+    def _update_intensities(self, steps):
+        "Compute intensity rows for those of `steps` which are not up to date"
+        if self._engineVersion != self.engine.version:
+            self._intensityRows[:] = False
+            self._engineVersion = self.engine.version
+        steps = np.asarray(steps, dtype=np.int64)
+        stale = steps[~self._intensityRows[steps]]
+        if not len(stale):
+            return
+        deltaH = self._chemshiftH[stale] - self._chemshiftH[0]
+        deltaN = self._chemshiftN[stale] - self._chemshiftN[0]
+        intensities = self.engine.compute(deltaH, deltaN, self.positions)
+        intensities[~(self._valid[stale] & self._valid[0])] = np.nan
+        self._intensities[stale] = intensities
+        self._intensityRows[stale] = True
+
+    def _check_writable(self):
+        if self.readonly:
+            raise IOError("Cannot modify read-only chemical shifts table.")
+
+## ---------------------------------------------
+##      Properties
+## ---------------------------------------------
+
+    @property
+    def chemshiftH(self):
+        "(steps x residues) hydrogen chem shifts, NaN where missing"
+        return self._chemshiftH[:self.steps]
+
+    @property
+    def chemshiftN(self):
+        "(steps x residues) nitrogen chem shifts, NaN where missing"
+        return self._chemshiftN[:self.steps]
+
+    @property
+    def valid(self):
+        "(steps x residues) boolean mask of measured chem shifts"
+        return self._valid[:self.steps]
+
+    @property
+    def complete(self):
+        "Boolean mask of residues having data for every titration step"
+        return self._complete
+
+    @property
+    def deltaChemshiftH(self):
+        "Hydrogen chem shift variation relative to reference step 0"
+        return self.chemshiftH - self._chemshiftH[0]
+
+    @property
+    def deltaChemshiftN(self):
+        "Nitrogen chem shift variation relative to reference step 0"
+        return self.chemshiftN - self._chemshiftN[0]
+
+    @property
+    def intensities(self):
+        "(steps x residues) chem shift intensities, NaN where missing"
+        self._update_intensities(np.arange(self.steps))
+        return self._intensities[:self.steps]
@@ -0,0 +1,116 @@
+""" ResidueSet class module
+
+Sets of residues of a titration, e.g complete, filtered or selected residues,
+stored as boolean masks over the sorted positions of a ChemshiftTable.
+Set algebra is performed on whole masks at once.
+"""
+
+import numpy as np
+
+
+class ResidueSet(object):
+    """
+    Class ResidueSet.
+    Immutable set of residues, as a boolean mask over `table` columns.
+    Supports set operators : & (intersection), | (union), - (difference), ^ (symmetric difference)
+    and ~ (complement), between sets built from the same table state.
+    Also behaves as a read-only {position: AminoAcid} mapping, using `residues` views.
+    """
+
+    __slots__ = ('table', 'residues', 'mask')
+
+    def __init__(self, table, residues, mask=None):
+        self.table = table
+        self.residues = residues
+        self.mask = np.zeros(len(table), dtype=bool) if mask is None else np.asarray(mask, dtype=bool)
+
+    @classmethod
+    def from_positions(cls, table, residues, positions):
+        "Build set of residues at `positions`, unknown positions are ignored"
+        positions = np.asarray(positions, dtype=np.int64)
+        mask = np.zeros(len(table), dtype=bool)
+        if len(positions) and len(table):
+            columns = np.minimum(table.columns(positions), len(table) - 1)
+            mask[columns[table.positions[columns] == positions]] = True
+        return cls(table, residues, mask)
+
+    def __repr__(self):
+        return "ResidueSet({positions})".format(positions=self.positions.tolist())
+
+## ---------------------------------------------
+##      Set algebra
+## ---------------------------------------------
+
+    def _combine(self, other, operation):
+        if not isinstance(other, ResidueSet):
+            return NotImplemented
+        if other.table is not self.table or len(other.mask) != len(self.mask):
+            raise ValueError("Cannot combine residue sets built from different titration states.")
+        return ResidueSet(self.table, self.residues, operation(self.mask, other.mask))
+
+    def __and__(self, other):
+        return self._combine(other, np.logical_and)
+
+    def __or__(self, other):
+        return self._combine(other, np.logical_or)
+
+    def __sub__(self, other):
+        return self._combine(other, lambda mask, otherMask: mask & ~otherMask)
+
+    def __xor__(self, other):
+        return self._combine(other, np.logical_xor)
+
+    def __invert__(self):
+        return ResidueSet(self.table, self.residues, ~self.mask)
+
+    def __eq__(self, other):
+        if not isinstance(other, ResidueSet):
+            return NotImplemented
+        return np.array_equal(self.positions, other.positions)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    __hash__ = None
+
+## ---------------------------------------------
+##      Mapping interface
+## ---------------------------------------------
+
+    def __len__(self):
+        return int(np.count_nonzero(self.mask))
+
+    def __bool__(self):
+        return bool(self.mask.any())
+
+    def __iter__(self):
+        return iter(self.positions.tolist())
+
+    def __contains__(self, position):
+        try:
+            return bool(self.mask[self.table.column(position)])
+        except (KeyError, TypeError):
+            return False
+
+    def __getitem__(self, position):
+        if position not in self:
+            raise KeyError(position)
+        return self.residues[position]
+
+    def get(self, position, default=None):
+        return self[position] if position in self else default
+
+    def keys(self):
+        return self.positions.tolist()
+
+    def values(self):
+        return [self.residues[pos] for pos in self.positions.tolist()]
+
+    def items(self):
+        return [(pos, self.residues[pos]) for pos in self.positions.tolist()]
+
+    @property
+    def positions(self):
+        "Sorted array of positions in set"
+        return self.table.positions[self.mask]
@@ -0,0 +1,51 @@
+""" ThresholdIndex class module
+
+Sort order of intensities, allowing cut-off queries by binary search
+instead of comparing every value on each cut-off change.
+"""
+
+import numpy as np
+
+
+class ThresholdIndex(object):
+    """
+    Class ThresholdIndex.
+    Answers `values >= threshold` queries on a fixed values array in O(log n).
+    Values passing a threshold are a suffix of the sort order, so that moving the threshold
+    only involves values between the old and new boundaries.
+    NaN values, e.g missing data, never pass threshold.
+    """
+
+    __slots__ = ('order', 'sortedValues', 'size')
+
+    def __init__(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        order = np.argsort(values, kind='mergesort') # NaN are sorted last
+        self.order = order[:len(values) - np.count_nonzero(np.isnan(values))]
+        self.sortedValues = values[self.order]
+        self.size = len(values)
+
+    def boundary(self, threshold):
+        "Rank in sort order of first value >= `threshold`. None threshold is never reached."
+        if threshold is None:
+            return len(self.order)
+        return int(np.searchsorted(self.sortedValues, threshold, side='left'))
+
+    def count(self, threshold):
+        "Number of values >= `threshold`"
+        return len(self.order) - self.boundary(threshold)
+
+    def above(self, threshold):
+        "Indexes of values >= `threshold`, by increasing value"
+        return self.order[self.boundary(threshold):]
+
+    def mask(self, threshold):
+        "Boolean mask of values >= `threshold`"
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.above(threshold)] = True
+        return mask
+
+    def crossed(self, oldThreshold, newThreshold):
+        "Indexes of values which `>= threshold` state differs between old and new thresholds"
+        first, last = sorted((self.boundary(oldThreshold), self.boundary(newThreshold)))
+        return self.order[first:last]
@@ -6,29 +6,26 @@ It calculates chemical shift variation at each titration step using the first st
 They are transformed into a single 'intensity' value, associated to a residue.
 The class provides matplotlib wrapping functions, allowing to display the data from the analysis,
 as well as setting a cut-off to filter residues having high intensity values.
+matplotlib and plot classes are only imported when plotting, to keep start up fast.
 """
 
 import os
 import glob
-import pickle
 import re
 import sys
-import csv
-import json
-import yaml
-from collections import OrderedDict
 from math import *
 
-import pandas as pd
-
-import matplotlib.pyplot as plt
 import numpy as np
-from matplotlib.ticker import FormatStrFormatter
 
-from classes.AminoAcid import AminoAcid
-from classes.protocole import TitrationProtocole
-from classes.plots import Hist, MultiHist, ShiftMap, SplitShiftMap, TitrationCurve
-from classes.widgets import CutOffCursor
+from .AminoAcid import AminoAcid
+from .cache import ParseCache
+from .ChemshiftTable import ChemshiftTable
+from .ResidueSet import ResidueSet
+from .ThresholdIndex import ThresholdIndex
+from .parsers import parse_list, read_list_files
+from .project import load_project, save_project
+from .watcher import DirectoryWatcher
+from .protocole import TitrationProtocole
 
 ##----------------------------------------------------------------------------------------------------------
 ##         Classe titration
@@ -37,24 +34,22 @@ from classes.widgets import CutOffCursor
 class Titration(object):
     """
     Class Titration.
-    Contains a list of aminoacid objects
+    Stores chemical shifts in a columnar ChemshiftTable,
+    and exposes each residue as an AminoAcid view on it.
     Provides methods for accessing each titration step datas.
     """
     # accepted file path pattern
     PATH_PATTERN = re.compile(r'(.+/)?(.*[^\d]+)(?P<step>[0-9]+)\.list')
-    # accepted lines pattern
-    LINE_PATTERN = re.compile(r'^(?P<position>\d+)(\S*)?\s+'
-                            r'(?P<chemshiftN>\d+\.\d+)\s+'
-                            r'(?P<chemshiftH>\d+\.\d+)$')
-    # ignored lines pattern
-    IGNORE_LINE_PATTERN = re.compile(r"^\d.*")
+    # named residue sets
+    RESIDUE_SETS = ('all', 'complete', 'incomplete', 'filtered', 'selected')
 
 
-    def __init__(self, name=None, cutoff=None, **kwargs):
+    def __init__(self, name=None, cutoff=None, cache=None, **kwargs):
         """
         Load titration files, check their integrity
         `source` is either a directory containing `.list` file, or is a list of `.list` files
         Separate complete vs incomplete data
+        `cache` is an optional ParseCache used when loading files from their path.
         """
 
         self.protocole = TitrationProtocole()
@@ -63,16 +58,17 @@ class Titration(object):
 
         self.name = ""
 
+        self.table = ChemshiftTable() # (steps x residues) chem shifts store
         self.residues = dict() # all residues {position:AminoAcid object}
-        self.complete = dict() # complete data residues
-        self.incomplete = dict() # incomplete data residues
-        self.selected = dict() # selected residues
-        self.intensities = list() # 2D array of intensities
+        self._selection = np.empty(0, dtype=np.int64) # sorted selected positions
+        self._thresholdIndexes = dict() # {step: ThresholdIndex of complete residues intensities}
+        self._thresholdState = None # table state of cached threshold indexes
 
         self.dataSteps = 0
         self.cutoff = None
 
         self.files = []
+        self.cache = cache
 
         ## INIT CUTOFF
         if cutoff: self.set_cutoff(cutoff)
@@ -107,51 +103,145 @@ class Titration(object):
             file=sys.stderr)
 
         # verify file
-        step = self.validate_filepath(fileName, verifyStep=True)
+        self.validate_filepath(fileName, verifyStep=True)
         # parse it
         try:
-            self.parse_titration_file(titrationStream)
+            positions, chemshiftH, chemshiftN = self.parse_titration_file(titrationStream)
         except ValueError as parseError:
             print("{error} in file {file}.".format(
                 error=parseError, file=fileName),
                 file=sys.stderr)
             return
 
+        self.merge_step(fileName, (positions, chemshiftH, chemshiftN), volume=volume)
+
+    def merge_step(self, fileName, chemshifts, volume=None):
+        """
+        Merges already parsed data from `fileName` as next titration step.
+        `chemshifts` is a (positions, chemshiftH, chemshiftN) tuple of arrays.
+        """
+        step = self.validate_filepath(fileName, verifyStep=True)
+        positions, chemshiftH, chemshiftN = chemshifts
+
+        newPositions = self.table.add_positions(positions)
+        lostPositions = self.table.add_step(positions, chemshiftH, chemshiftN)
         self.dataSteps += 1
         self.files.append(fileName)
 
         if volume is not None:
-            if self.steps < self.dataSteps:
+            if self.protocole.steps < self.dataSteps:
                 self.protocole.add_volume(volume)
             else:
                 self.protocole.update_volumes({step:volume})
 
-
-        # create residues with no data for missing positions
-        for pos in range(min(self.residues), max(self.residues)):
-            if pos not in self.residues:
-                self.residues.update({pos: AminoAcid(position=pos)})
-
-        # reset complete residues and update
-        self.complete = dict()
-        for pos, res in self.residues.items():
-            if res.validate(self.dataSteps):
-                self.complete.update({pos:res})
-            else:
-                self.incomplete.update({pos:res})
+        # update complete/incomplete partitions with residues touched by this step only
+        self._update_residues(np.concatenate((newPositions, self._fill_gaps(), lostPositions)))
 
         print("\t\t{incomplete} incomplete residue out of {total}".format(
              incomplete=len(self.incomplete), total=len(self.residues)),
              file=sys.stderr)
 
-        # Recalculate (position, chem shift intensity) coordinates for histogram plot
-        self.intensities = [] # 2D array, by titration step then residu position
-        for step in range(self.dataSteps): # intensity is null for reference step, ignoring
-            self.intensities.append([self.complete[pos].chemshiftIntensity[step] for pos in sorted(self.complete.keys())])
+    def replace_step(self, fileName, chemshifts):
+        """
+        Replaces data of already loaded titration step from `fileName`, e.g when file changed.
+        `chemshifts` is a (positions, chemshiftH, chemshiftN) tuple of arrays.
+        """
+        step = self.files.index(fileName)
+        positions, chemshiftH, chemshiftN = chemshifts
+
+        print("[Step {step}]\tReplacing NMR data from {titration_file}".format(
+            step=step, titration_file=fileName),
+            file=sys.stderr)
+
+        newPositions = self.table.add_positions(positions)
+        changedColumns = self.table.replace_step(step, positions, chemshiftH, chemshiftN)
+        self._update_residues(np.concatenate((newPositions, self._fill_gaps(),
+                                              self.table.positions[changedColumns])))
+        return step
+
+    def load_files(self, filePaths, jobs=1, callback=None, cancelled=None):
+        """
+        Parses `.list` files at `filePaths` and adds them as next titration steps, in given order.
+        With `jobs` > 1, files are parsed in parallel on a process pool. Use None to use all CPUs.
+        `callback` is called with (file, done, total) after each parsed file,
+        loading stops before next file as soon as `cancelled` callable returns True.
+        Protocole volume edits are batched, its listeners are notified once.
+        Returns list of added files.
+        """
+        filePaths = list(filePaths)
+        added = []
+        with self.protocole.batch():
+            for done, (file, chemshifts, elapsed) in enumerate(read_list_files(filePaths, jobs=jobs, cache=self.cache), 1):
+                if cancelled is not None and cancelled():
+                    break
+                print("[Step {step}]\tLoaded NMR data from {titration_file} in {time:.3f} s".format(
+                    step=self.dataSteps, titration_file=file, time=elapsed),
+                    file=sys.stderr)
+                if isinstance(chemshifts, Exception):
+                    print("{error} in file {file}.".format(
+                        error=chemshifts, file=file),
+                        file=sys.stderr)
+                else:
+                    try:
+                        self.merge_step(file, chemshifts)
+                        added.append(file)
+                    except IOError as fileError:
+                        print("{error}".format(error=fileError), file=sys.stderr)
+                if callback is not None:
+                    callback(file, done, len(filePaths))
+        return added
+
+    def update_files(self, filePaths, jobs=1):
+        """
+        Ingests `filePaths`, e.g reported by a DirectoryWatcher.
+        Already loaded files are parsed again and replace their step data,
+        other files are added as next steps, sorted by step.
+        Protocole volume edits are batched, its listeners are notified once.
+        Returns (added, replaced) lists of files.
+        """
+        filePaths = set(filePaths)
+        replaced = []
+        with self.protocole.batch():
+            for file, chemshifts, elapsed in read_list_files(sorted(filePaths.intersection(self.files)),
+                                                             jobs=jobs, cache=self.cache):
+                if isinstance(chemshifts, Exception):
+                    print("{error} in file {file}.".format(
+                        error=chemshifts, file=file),
+                        file=sys.stderr)
+                    continue
+                self.replace_step(file, chemshifts)
+                replaced.append(file)
+            newFiles = sorted(filePaths.difference(self.files), key=self.validate_filepath)
+            return self.load_files(newFiles, jobs=jobs), replaced
+
+    def _fill_gaps(self):
+        "Creates columns with no data for missing positions. Returns created positions."
+        return self.table.add_positions(self.table.missing_positions())
+
+    def _update_residues(self, positions):
+        "Creates missing AminoAcid views at `positions`"
+        for pos in np.asarray(positions, dtype=np.int64).tolist():
+            if pos not in self.residues:
+                self.residues[pos] = AminoAcid(self.table, pos)
 
     def set_cutoff(self, cutoff):
         "Sets cut off for all titration steps"
-        raise NotImplementedError
+        self.cutoff = float(cutoff)
+        return self.cutoff
+
+    def set_intensity_params(self, nitrogenWeight=None, mode=None, residueWeights=None,
+                             glycines=None, glycineWeight=None):
+        """
+        Sets chem shift intensity parameters, see IntensityEngine.
+        `glycines` positions, and already set glycines, use `glycineWeight` nitrogen weight.
+        Intensities are recomputed on next access. Raises ValueError on invalid parameters.
+        """
+        if glycineWeight is not None and glycineWeight < 0:
+            raise ValueError("Glycine nitrogen weight must be positive")
+        self.table.engine.set_params(nitrogenWeight=nitrogenWeight, mode=mode, residueWeights=residueWeights)
+        if glycines or glycineWeight is not None:
+            self.table.engine.set_glycines(glycines, weight=glycineWeight)
+        return self.table.engine
 
     def validate_filepath(self, filePath, verifyStep=False):
         """
@@ -176,52 +266,79 @@ class Titration(object):
     def parse_titration_file(self, stream):
         """
         Titration file parser.
-        Returns a new dict which keys are residues' position and values are AminoAcid objects.
-        If residues argument is provided, updates AminoAcid by adding parsed chemical shift values.
+        Reads the whole stream in one pass, see classes.parsers.parse_list.
+        Returns a (positions, chemshiftH, chemshiftN) tuple of arrays, one item per parsed line.
         Throws ValueError if incorrect lines are encountered in file.
         """
-        for lineNb, line in enumerate(stream) :
-            try:
-                chemshifts = self.parse_line(line)
-                if chemshifts is not None:
-                    self.add_chemshifts(chemshifts)
-            except ValueError as parseError:
-                parseError.args = ("{error} at line {line}".format(
-                    error=parseError, line=lineNb), )
-                raise
-                continue
-
-    def parse_line(self, line):
-        "Parses a line from titration file, returning a dictionnaryof parsed data"
-        line = line.strip()
-        # ignore empty lines and header lines
-        if self.IGNORE_LINE_PATTERN.match(line):
-            # attempt to match to expected format
-            match = self.LINE_PATTERN.match(line)
-            if match: # parse as dict
-                chemshifts = match.groupdict()
-                # Convert parsed str to number types
-                for castFunc, key in zip((float, float, int), sorted(chemshifts)):
-                    chemshifts[key] = castFunc(chemshifts[key])
-                # add or update residue
-                return chemshifts
-            else:
-                # non parsable, non ignorable line
-                raise ValueError("Found unparsable line")
-
-    def add_chemshifts(self, chemshifts):
-        "Arg chemshifts is a dict with keys position, chemshiftH, chemshiftN"
-        position = chemshifts["position"]
-        if self.residues.get(position):
-            # update AminoAcid object in residues dict
-            self.residues[position].add_chemshifts(**chemshifts)
-        else:
-            # create AminoAcid object in residues dict
-            self.residues[position] = AminoAcid(**chemshifts)
-        return self.residues[position]
+        return parse_list(stream.read())
 
 
+## -------------------------
+##    Input/output
+## -------------------------
 
+    def save(self, path):
+        """
+        Save titration as a Shift2Me project file.
+        Chem shifts, masks and protocole table are stored as raw array blocks,
+        name, files and protocole parameters as JSON metadata.
+        """
+        arrays = {
+            'positions' : self.table.positions,
+            'chemshiftH' : self.table.chemshiftH,
+            'chemshiftN' : self.table.chemshiftN,
+            'valid' : self.table.valid,
+            'protocole' : self.protocole.values
+        }
+        metadata = {
+            'name' : self.name,
+            'working_directory' : self.working_directory,
+            'cutoff' : self.cutoff,
+            'intensity' : {
+                'mode' : self.table.engine.mode,
+                'nitrogenWeight' : self.table.engine.nitrogenWeight,
+                'residueWeights' : [[pos, weight] for pos, weight in self.table.engine.residueWeights.items()],
+                'glycines' : sorted(self.table.engine.glycines),
+                'glycineWeight' : self.table.engine.glycineWeight
+            },
+            'files' : list(self.files),
+            'protocole' : self.protocole.as_init_dict,
+            'protocole_columns' : [self.protocole.col_aliases[alias] for alias in self.protocole.COLUMN_ALIASES]
+        }
+        return save_project(path, arrays, metadata)
+
+    def load(self, path, mmap=False):
+        """
+        Loads previously saved titration project in place of current instance.
+        With `mmap`, chem shifts are memory-mapped read-only from the project file,
+        and only read from disk when needed. Adding steps is then forbidden.
+        Raises ValueError if `path` is not a valid project file.
+        """
+        arrays, metadata = load_project(path, blocks=('positions', 'chemshiftH', 'chemshiftN', 'valid', 'protocole'),
+                                        mmap=mmap)
+
+        self.table = ChemshiftTable.from_arrays(arrays['positions'], arrays['chemshiftH'],
+                                                arrays['chemshiftN'], arrays['valid'],
+                                                readonly=mmap)
+        intensity = metadata.get('intensity', {})
+        self.table.engine.set_params(nitrogenWeight=intensity.get('nitrogenWeight'),
+                                     mode=intensity.get('mode'),
+                                     residueWeights=dict(intensity.get('residueWeights', [])))
+        if intensity.get('glycines') or intensity.get('glycineWeight') is not None:
+            self.table.engine.set_glycines(intensity.get('glycines'), weight=intensity.get('glycineWeight'))
+        self.residues = dict((pos, AminoAcid(self.table, pos)) for pos in self.table.positions.tolist())
+        self._selection = np.empty(0, dtype=np.int64)
+        self.dataSteps = self.table.steps
+        self.files = list(metadata.get('files', []))
+        self.working_directory = metadata.get('working_directory')
+        self.cutoff = metadata.get('cutoff')
+        self.set_name(metadata.get('name'))
+
+        self.protocole = TitrationProtocole()
+        if metadata.get('protocole'):
+            self.protocole.load_init_dict(metadata['protocole'], validate=False)
+        self.protocole.load_values(arrays['protocole'], metadata.get('protocole_columns'))
+        return self
 
 ## -------------------------
 ##    Utils
@@ -229,40 +346,105 @@ class Titration(object):
 
     def select_residues(self, *positions):
         "Select a subset of residues"
-        for pos in positions:
-            try:
-                self.selected[pos] = self.residues[pos]
-            except KeyError:
-                print("Residue at position {pos} does not exist. Skipping selection.".format(
-                    pos=pos), file=sys.stderr)
-                continue
+        positions = np.asarray(positions, dtype=np.int64)
+        known = ResidueSet.from_positions(self.table, self.residues, positions)
+        for pos in np.setdiff1d(positions, known.positions).tolist():
+            print("Residue at position {pos} does not exist. Skipping selection.".format(
+                pos=pos), file=sys.stderr)
+        self._selection = np.union1d(self._selection, known.positions)
         return self.selected
 
 
-    def deselect_residues(self, *positions):
-        "Deselect some residues. Calling with no arguments will deselect all."
-        try:
-            if not positions:
-                self.selected = dict()
-            else:
-                for pos in positions:
-                    self.selected.pop(pos)
-            return self.selected
-        except KeyError:
-            pass
+    def deselect_residues(self, positions=None):
+        "Deselect residues at `positions`, an empty sequence deselects nothing. Calling with no arguments will deselect all."
+        if positions is None:
+            self._selection = np.empty(0, dtype=np.int64)
+        else:
+            self._selection = np.setdiff1d(self._selection, np.asarray(list(positions), dtype=np.int64))
+        return self.selected
+
+    def threshold_index(self, step=-1):
+        """
+        Returns ThresholdIndex over complete residues intensities at `step`,
+        allowing cut-off queries by binary search. Indexes are cached until data or intensity parameters change.
+        """
+        step = step if step >= 0 else self.dataSteps + step
+        state = (self.table, self.table.version, self.table.engine.version)
+        if self._thresholdState != state:
+            self._thresholdIndexes = dict()
+            self._thresholdState = state
+        index = self._thresholdIndexes.get(step)
+        if index is None:
+            intensities = np.where(self.table.complete, self.table.intensity_row(step), np.nan)
+            index = self._thresholdIndexes[step] = ThresholdIndex(intensities)
+        return index
+
+    def residue_set(self, name):
+        "Returns residue set named `name`, one of RESIDUE_SETS. Raises ValueError if unknown."
+        if name not in self.RESIDUE_SETS:
+            raise ValueError("Unknown residue set {name}, expected one of {names}".format(
+                name=name, names=", ".join(self.RESIDUE_SETS)))
+        return self.allResidues if name == 'all' else getattr(self, name)
+
+    def residue_range(self, start=None, stop=None):
+        """
+        Returns sorted list of existing residue positions in [`start`, `stop`) range.
+        Open bounds (None) extend to first/last residue. Runs in O(log n) using sorted table positions.
+        """
+        return self.table.position_range(start, stop).tolist()
 
 
 ## --------------------------
 ##    Properties
 ## --------------------------
 
+    @property
+    def allResidues(self):
+        "Set of all residues"
+        return ResidueSet(self.table, self.residues, np.ones(len(self.table), dtype=bool))
+
+    @property
+    def complete(self):
+        "Set of residues having data for every titration step"
+        return ResidueSet(self.table, self.residues, self.table.complete.copy())
+
+    @property
+    def incomplete(self):
+        "Set of residues missing data for some titration step"
+        return ResidueSet(self.table, self.residues, ~self.table.complete)
+
+    @property
+    def selected(self):
+        "Set of selected residues"
+        return ResidueSet.from_positions(self.table, self.residues, self._selection)
+
     @property
     def filtered(self):
-        "Returns list of filtered residue having last intensity >= cutoff value"
-        if self.cutoff is not None:
-            return dict([(res.position, res) for res in self.complete.values() if res.chemshiftIntensity[-1] >= self.cutoff])
+        "Set of complete residues having last intensity >= cutoff value"
+        if self.cutoff is not None and self.dataSteps:
+            return ResidueSet(self.table, self.residues, self.threshold_index(-1).mask(self.cutoff))
         else:
-            return dict()
+            return ResidueSet(self.table, self.residues)
+
+    @property
+    def firstPosition(self):
+        "Lowest residue position, or None if no data"
+        return int(self.table.positions[0]) if len(self.table) else None
+
+    @property
+    def lastPosition(self):
+        "Highest residue position, or None if no data"
+        return int(self.table.positions[-1]) if len(self.table) else None
+
+    @property
+    def completePositions(self):
+        "Sorted list of complete residues positions"
+        return self.table.positions[self.table.complete].tolist()
+
+    @property
+    def intensities(self):
+        "2D array of complete residues chem shift intensities, by titration step then residue position"
+        return self.table.intensities[:, self.table.complete]
 
     @property
     def sortedSteps(self):
@@ -274,7 +456,12 @@ class Titration(object):
 
 class TitrationCLI(Titration):
 
-    def __init__(self, working_directory, name=None, cutoff=None, initFile=None, **kwargs):
+    def __init__(self, working_directory, name=None, cutoff=None, initFile=None, jobs=1, cache=True, **kwargs):
+        """
+        Loads titration from `.list` files in `working_directory`.
+        `jobs` is the number of processes used for parsing files.
+        `cache` may be a ParseCache, True to use default cache, or False to always parse files.
+        """
 
         if not os.path.isdir(working_directory):
             raise IOError("{dir} does not exist")
@@ -282,7 +469,10 @@ class TitrationCLI(Titration):
 
         self.dirPath = working_directory
 
-        Titration.__init__(self, name=name, **kwargs)
+        if not isinstance(cache, ParseCache):
+            cache = ParseCache() if cache else None
+        Titration.__init__(self, name=name, cache=cache, **kwargs)
+        self.set_directory(working_directory)
 
         # init plots
         self.stackedHist = None
@@ -291,7 +481,7 @@ class TitrationCLI(Titration):
         # fetch all .list files in source dir, parse
         # add a step for each file
         try:
-            self.update()
+            self.update(jobs=jobs)
         except IOError as error:
             print("{error}".format(error=error), file=sys.stderr)
             exit(1)
@@ -308,18 +498,17 @@ class TitrationCLI(Titration):
         try:
             with open(titrationFilePath, 'r') as titrationStream:
                 Titration.add_step(self, titrationFilePath, titrationStream, volume=volume)
-
-            # generate colors for each titration step
-            self.colors = plt.cm.get_cmap('hsv', self.dataSteps)
-
-            # close stale stacked hist
-            if self.stackedHist and not self.stackedHist.closed:
-                self.stackedHist.close()
-
         except IOError as fileError:
             print("{error}".format(error=fileError), file=sys.stderr)
             return
 
+    def merge_step(self, fileName, chemshifts, volume=None):
+        Titration.merge_step(self, fileName, chemshifts, volume=volume)
+
+        # close stale stacked hist
+        if self.stackedHist and not self.stackedHist.closed:
+            self.stackedHist.close()
+
 
     def set_cutoff(self, cutoff):
         "Sets cut off for all titration steps"
@@ -338,6 +527,17 @@ class TitrationCLI(Titration):
                 error=err), file=sys.stderr)
             return self.cutoff
 
+    def set_intensity_params(self, **params):
+        "Sets chem shift intensity parameters and updates open histograms"
+        try:
+            engine = super().set_intensity_params(**params)
+        except ValueError as paramError:
+            print("Invalid intensity parameters : {error}".format(
+                error=paramError), file=sys.stderr)
+            return self.table.engine
+        self.refresh_hists(list(range(self.dataSteps)))
+        return engine
+
 ## -------------------------
 ##    Utils
 ## -------------------------
@@ -381,7 +581,13 @@ class TitrationCLI(Titration):
             files = set(source)
         return files
 
-    def update(self, source=None):
+    def update(self, source=None, jobs=1):
+        """
+        Adds new `.list` files from `source` as next titration steps.
+        With `jobs` > 1, files are parsed in parallel on a process pool,
+        then merged in step order. Use None to use all CPUs.
+        Unchanged files are read from parse cache if enabled.
+        """
         files = self.extract_source(source)
 
         # exclude already known files
@@ -395,42 +601,104 @@ class TitrationCLI(Titration):
             return
 
         # load files
-        for file in files:
-            self.add_step(file)
+        self.load_files(files, jobs=jobs)
 
         return files
 
+    def ingest(self, filePaths, jobs=1):
+        """
+        Ingests new or changed files, see Titration.update_files,
+        then updates open histograms.
+        """
+        stackedOpen = self.stackedHist is not None and not self.stackedHist.closed
+        complete = self.completePositions
+        added, replaced = self.update_files(filePaths, jobs=jobs)
+        if added and stackedOpen:
+            self.plot_hist()
+        steps = [self.files.index(file) for file in replaced]
+        if 0 in steps or self.completePositions != complete:
+            # reference step or complete residues changed, intensities of every step changed
+            steps = list(range(self.dataSteps))
+        self.refresh_hists(steps)
+        return added, replaced
+
+    def refresh_hists(self, steps):
+        """
+        Updates open histograms showing `steps` with current intensities.
+        Bars heights are updated in place when complete residues did not change,
+        histogram is plotted again otherwise.
+        """
+        positions = self.completePositions
+        intensities = self.intensities
+        for step in steps:
+            hist = self.hist.get(step)
+            if hist is not None and not hist.closed:
+                if hist.xaxis == positions:
+                    hist.set_heights(intensities[step])
+                else:
+                    self.plot_hist(step)
+        if steps and self.stackedHist is not None and not self.stackedHist.closed:
+            if self.stackedHist.xaxis == positions and len(self.stackedHist.bars) == self.dataSteps - 1:
+                for step in steps:
+                    if step > 0:
+                        self.stackedHist.set_heights(intensities[step], axIndex=step - 1)
+            else:
+                self.plot_hist()
+
+    def watch(self, interval=1.0, jobs=1, callback=None):
+        """
+        Watches titration directory, ingesting new or changed `.list` files as soon as they are written.
+        `callback` is called with (added, replaced) lists of files after each change.
+        Blocks until interrupted with Ctrl-C.
+        """
+        import matplotlib.pyplot as plt
+        watcher = DirectoryWatcher(self.dirPath, known=self.files)
+        try:
+            while True:
+                changed = watcher.poll()
+                if changed:
+                    added, replaced = self.ingest(changed, jobs=jobs)
+                    # rejected files, e.g written before previous step, are retried at next poll
+                    watcher.acknowledge(added + replaced)
+                    if callback is not None:
+                        callback(added, replaced)
+                # keep figures responsive while waiting
+                plt.pause(interval)
+        except KeyboardInterrupt:
+            return
+
     def save(self, path):
         "Save method for titration object"
         try:
-            # matplotlib objects can't be saved
-            stackedHist = self.stackedHist
-            hist = self.hist
-            self.stackedHist= None
-            self.hist = dict()
-            with open(path, 'wb') as saveHandle:
-                pickle.dump(self, saveHandle)
-            # restore matplotlib objects
-            self.stackedHist = stackedHist
-            self.hist = hist
+            return Titration.save(self, path)
         except IOError as fileError:
             print("Could not save titration : {error}\n".format(error=fileError), file=sys.stderr)
 
-    def load(self, path):
+    def load(self, path, mmap=False):
         "Loads previously saved titration in place of current instance"
         try:
-            with open(path, 'rb') as loadHandle:
-                self = pickle.load(loadHandle)
-                if type(self) == Titration:
-                    return self
-                else:
-                    raise ValueError("{file} does not contain a Titration object".format(file=path))
+            Titration.load(self, path, mmap=mmap)
         except (ValueError, IOError) as loadError:
             print("Could not load titration : {error}\n".format(error=loadError), file=sys.stderr)
+            return
+        self.dirPath = self.working_directory or self.dirPath
+        # loaded data replaces plotted data
+        for hist in list(self.hist.values()) + [self.stackedHist]:
+            if hist and not hist.closed:
+                hist.close()
+        self.stackedHist = None
+        self.hist = dict()
+        return self
 
 ## -------------------------------------------
 ##      Properties
 ## -------------------------------------------
+    @property
+    def colors(self):
+        "Colormap with a color for each titration step"
+        from matplotlib import cm
+        return cm.get_cmap('hsv', max(self.dataSteps, 1))
+
     @property
     def concentrationRatio(self):
     	return self.protocole['ratio'].tolist()
@@ -461,12 +729,13 @@ class TitrationCLI(Titration):
         Define all the options needed (step, cutoof) for the representation.
         Call the getHistogram function to show corresponding histogram plots.
         """
+        from .plots import Hist, MultiHist
         if not step: # plot stacked histograms of all steps
             # close stacked hist if needed
             if self.stackedHist and not self.stackedHist.closed:
                 self.stackedHist.close()
             # replace stacked hist with new hist
-            hist = MultiHist(self.complete,self.intensities[1:])
+            hist = MultiHist(self.completePositions, self.intensities[1:])
             self.stackedHist = hist
         else: # plot specific titration step
             # allow accession using python-ish negative index
@@ -475,7 +744,7 @@ class TitrationCLI(Titration):
             if self.hist.get(step) and not self.hist[step].closed:
                 self.hist[step].close()
             # plot new hist
-            hist = Hist(self.complete, self.intensities[step], step=step)
+            hist = Hist(self.completePositions, self.intensities[step], step=step)
             self.hist[step] = hist
         # add cutoff change event handling
         hist.add_cutoff_listener(self.set_cutoff, mouseUpdateOnly=True)
@@ -492,6 +761,7 @@ class TitrationCLI(Titration):
         `residue` argument should be an iterable of AminoAcid objects.
         If using `split` option, each residue is plotted in its own subplot.
         """
+        from .plots import ShiftMap, SplitShiftMap
         residues = list(residues)
         if split and len(residues) > 1:
             shiftmap = SplitShiftMap(residues)
@@ -503,6 +773,7 @@ class TitrationCLI(Titration):
 
     def plot_titration(self, residue):
         "Plots a titration curve for `residue`, using intensity at each step"
+        from .plots import TitrationCurve
         curve = TitrationCurve(self.concentrationRatio[:self.dataSteps], residue,
                                 titrant=self.protocole.titrant['name'],
                                 analyte=self.protocole.analyte['name'])
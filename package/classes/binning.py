@@ -0,0 +1,44 @@
+""" Residue binning for level of detail rendering
+
+When more residues are displayed than there are pixels, residues are aggregated
+into fixed-width bins of positions, keeping the maximum intensity of each bin.
+A bin is then above a cut off whenever any of its residues is.
+Bin widths are powers of 2 anchored on first position, so that bins are stable while panning
+and only change when zooming past a level.
+"""
+
+from math import ceil, log2
+
+import numpy as np
+
+
+def bin_width(span, pixels):
+    "Bin width (in positions) for displaying `span` positions on `pixels`, None if no binning is needed"
+    if pixels <= 0 or span <= pixels:
+        return None
+    return 2 ** int(ceil(log2(span / pixels)))
+
+
+def bin_starts(positions, width):
+    "Indexes of first residue of each non-empty bin of `width` positions, for sorted `positions`"
+    positions = np.asarray(positions)
+    if not len(positions):
+        return np.empty(0, dtype=np.int64)
+    binIds = (positions - positions[0]) // width
+    return np.concatenate(([0], np.flatnonzero(np.diff(binIds)) + 1))
+
+
+def bin_centers(positions, width, starts):
+    "Center positions of bins starting at `starts` indexes"
+    positions = np.asarray(positions)
+    binIds = (positions[starts] - positions[0]) // width
+    return positions[0] + (binIds + 0.5) * width - 0.5
+
+
+def bin_max(values, starts):
+    "Maximum of `values` in each bin, ignoring NaN. Bins with no data are NaN."
+    values = np.asarray(values, dtype=np.float64)
+    if not len(starts):
+        return np.empty(0)
+    with np.errstate(invalid='ignore'):
+        return np.fmax.reduceat(values, starts)
@@ -0,0 +1,127 @@
+""" Parsed titration files cache
+
+Stores parsed (positions, chemshiftH, chemshiftN) arrays of `.list` files on disk,
+so that reopening an unchanged experiment directory does not parse files again.
+Entries are keyed by absolute path, size, modification time and parser version,
+and saved in the Shift2Me project format.
+Cache size is bounded, least recently used entries are evicted first.
+"""
+
+import glob
+import hashlib
+import os
+import sys
+import tempfile
+
+from .parsers import PARSER_VERSION, read_list_file
+from .project import load_project, save_project
+
+
+class ParseCache(object):
+    """
+    Class ParseCache.
+    On-disk LRU cache of parsed `.list` files.
+    Entry modification time is refreshed on each hit and used as last access time.
+    """
+
+    DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'shift2me')
+    DEFAULT_MAX_SIZE = 256 * 2**20 # bytes
+    EXTENSION = '.s2c'
+
+    def __init__(self, directory=None, maxSize=None):
+        self.directory = directory or self.DEFAULT_DIRECTORY
+        self.maxSize = maxSize or self.DEFAULT_MAX_SIZE
+
+    def key(self, filePath):
+        "Cache key of file at `filePath`, from its absolute path, size, mtime and parser version"
+        filePath = os.path.abspath(filePath)
+        stat = os.stat(filePath)
+        signature = "{path}\0{size}\0{mtime}\0{version}".format(
+            path=filePath, size=stat.st_size, mtime=stat.st_mtime_ns, version=PARSER_VERSION)
+        return hashlib.sha1(signature.encode('utf-8')).hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key + self.EXTENSION)
+
+    def get(self, filePath, key=None):
+        "Returns cached (positions, chemshiftH, chemshiftN) for `filePath`, or None. `key` defaults to file current key"
+        entryPath = self.entry_path(key or self.key(filePath))
+        try:
+            arrays, metadata = load_project(entryPath)
+            os.utime(entryPath)
+        except (ValueError, OSError):
+            return None
+        return arrays['positions'], arrays['chemshiftH'], arrays['chemshiftN']
+
+    def put(self, filePath, chemshifts, key=None):
+        """
+        Stores parsed `chemshifts` tuple for `filePath`.
+        `key` defaults to file current key, pass the key computed before parsing if file may have changed meanwhile.
+        """
+        positions, chemshiftH, chemshiftN = chemshifts
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # write to a temporary file first, so that concurrent readers never see partial entries
+            handle, tmpPath = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            os.close(handle)
+            save_project(tmpPath,
+                         {'positions' : positions, 'chemshiftH' : chemshiftH, 'chemshiftN' : chemshiftN},
+                         {'source' : os.path.abspath(filePath)})
+            os.replace(tmpPath, self.entry_path(key or self.key(filePath)))
+        except OSError as cacheError:
+            print("Could not cache {file} : {error}".format(file=filePath, error=cacheError),
+                  file=sys.stderr)
+
+    def read(self, filePath):
+        """
+        Returns parsed data of `filePath`, from cache if up to date, parsing and caching it otherwise.
+        Files changing while parsed, e.g still being written, are not cached.
+        """
+        key = self.key(filePath)
+        chemshifts = self.get(filePath, key=key)
+        if chemshifts is None:
+            chemshifts = read_list_file(filePath)
+            if self.key(filePath) == key:
+                self.put(filePath, chemshifts, key=key)
+        return chemshifts
+
+    def entries(self):
+        "List of (path, size, last access time) of cache entries, least recently used first"
+        entries = []
+        for entryPath in glob.glob(os.path.join(self.directory, '*' + self.EXTENSION)):
+            try:
+                stat = os.stat(entryPath)
+            except OSError: # removed meanwhile
+                continue
+            entries.append((entryPath, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    @property
+    def size(self):
+        "Total size of cache entries in bytes"
+        return sum(size for path, size, mtime in self.entries())
+
+    def evict(self):
+        "Removes least recently used entries until cache fits in max size"
+        entries = self.entries()
+        size = sum(size for path, size, mtime in entries)
+        for entryPath, entrySize, mtime in entries:
+            if size <= self.maxSize:
+                break
+            try:
+                os.remove(entryPath)
+            except OSError:
+                pass
+            size -= entrySize
+        return size
+
+    def clear(self):
+        "Removes all cache entries. Returns number of removed entries"
+        removed = 0
+        for entryPath, size, mtime in self.entries():
+            try:
+                os.remove(entryPath)
+                removed += 1
+            except OSError:
+                pass
+        return removed
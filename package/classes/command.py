@@ -1,6 +1,10 @@
+import operator
 import os
+import re
 from cmd2 import Cmd, options, make_option
 from classes.Titration import Titration
+from classes.project import read_metadata
+from classes.ResidueSet import ResidueSet
 from tabulate import tabulate
 
 class ShiftShell(Cmd):
@@ -8,6 +12,15 @@ class ShiftShell(Cmd):
     """
     intro = "Type help or ? to list commands.\n"
     prompt = ">> "
+    # residue set expressions operators. `|` is reserved by cmd2 for piping, `+` is used for union.
+    SET_OPERATORS = {
+        "&" : operator.and_,
+        "+" : operator.or_,
+        "-" : operator.sub,
+        "^" : operator.xor
+    }
+    # operators split terms with or without surrounding spaces, slices use `:` so `-` is always difference
+    SET_TOKEN_PATTERN = re.compile(r'[-&+^]|[^\s&+^-]+')
 
     def __init__(self, *args, **kwargs):
         self.cutoff=None
@@ -29,6 +42,7 @@ class ShiftShell(Cmd):
         # Set path completion for save/load
         self.complete_save_job=self.path_complete
         self.complete_load_job=self.path_complete
+        self.complete_job_info=self.path_complete
         self.complete_add_step=self.path_complete
         self.complete_concentrations=self.path_complete
         self.complete_make_init=self.path_complete
@@ -141,7 +155,9 @@ class ShiftShell(Cmd):
 
 ## RMN ANALYSIS CMDS ---------------------------------
 
-    @options([], arg_desc='[ <directory> | <titration_file.list> ... ]')
+    @options([make_option('-j', '--jobs', type="int", default=1,
+                help="Number of processes parsing files in parallel, 0 for all CPUs")],
+            arg_desc='[ <directory> | <titration_file.list> ... ]')
     def do_update(self, arg, opts=None):
         """Update titration from <source>.
         If source is a directory, will add all the .list files.
@@ -151,9 +167,10 @@ class ShiftShell(Cmd):
         No argument uses directory from first invocation, looking for
         any new step .list files in it.
         Already loaded files are ignored.
+        Use -j option to parse files in parallel.
         """
         try:
-            files = self.titration.update(arg)
+            files = self.titration.update(arg, jobs=opts.jobs or None)
             if files:
                 self.pfeedback("Updated titration steps with new data from files : ")
                 for updateFile in files:
@@ -164,6 +181,37 @@ class ShiftShell(Cmd):
             self.pfeedback(error)
             return
 
+    @options([make_option('-i', '--interval', type="float", default=1.0,
+                help="Seconds between directory checks"),
+              make_option('-j', '--jobs', type="int", default=1,
+                help="Number of processes parsing files in parallel, 0 for all CPUs")])
+    def do_watch(self, arg, opts=None):
+        """Watch titration directory while spectrometer writes new steps.
+        New .list files are added as next steps, changed ones replace their step data.
+        Open histograms are updated accordingly.
+        Press Ctrl-C to stop watching.
+        """
+        self.pfeedback("Watching {dir} for new titration steps. Press Ctrl-C to stop.".format(
+            dir=self.titration.dirPath))
+        self.titration.watch(interval=opts.interval, jobs=opts.jobs or None,
+                             callback=self._watch_feedback)
+        self.pfeedback("Stopped watching.")
+
+    def _watch_feedback(self, added, replaced):
+        for updateFile in added:
+            self.pfeedback(" + {file}".format(file=updateFile))
+        for updateFile in replaced:
+            self.pfeedback(" ~ {file}".format(file=updateFile))
+
+    def do_clear_cache(self, arg):
+        "Remove all cached parsed titration files."
+        if self.titration.cache is None:
+            self.pfeedback("Parse cache is disabled.")
+            return
+        removed = self.titration.cache.clear()
+        self.pfeedback("Removed {count} entries from {dir}.".format(
+            count=removed, dir=self.titration.cache.directory))
+
     @options([make_option('-v', '--volume', help="Volume of titrant solution to add titration step")],arg_desc='<titration_file_##.list>')
     def do_add_step(self, arg, opts=None):
         """Add a titration file as next step. Associate a volume to this step with -v option.
@@ -175,110 +223,116 @@ class ShiftShell(Cmd):
             self.do_help("add_step")
 
     def do_save_job(self, arg):
-        """Save active titration to binary pickle formatted file.
+        """Save active titration to binary Shift2Me project file.
          Argument may be a file path to write into.
-         Invocation with no argument saves to a pickle formatted file named as your titration is.
+         Invocation with no argument saves to a project file named as your titration is.
          """
         if not arg or os.path.isdir(arg):
-            path = os.path.join(arg, '{titration}.pkl'.format(titration=self.titration.name))
-        elif not arg.endswith(".pkl"):
-            path = arg + ".pkl"
+            path = os.path.join(arg, '{titration}.s2m'.format(titration=self.titration.name))
+        elif not arg.endswith(".s2m"):
+            path = arg + ".s2m"
         else:
             path = arg
-        self.titration.save(path)
-        self.pfeedback("Saved job at : {path}.".format(path = path))
-
-    def do_load_job(self, arg):
-        "Load previously saved titration in pickle format, replacing active titration."
+        if self.titration.save(path):
+            self.pfeedback("Saved job at : {path}.".format(path = path))
+
+    @options([make_option('-m', '--mmap', action="store_true",
+                help="Open read-only, reading data from disk only when needed")],
+            arg_desc='<project.s2m>')
+    def do_load_job(self, arg, opts=None):
+        """Load previously saved titration project file, replacing active titration.
+        Use -m option to browse large or archived projects without loading them in memory.
+        """
+        if not arg:
+            self.do_help('load_job')
+            return
+        arg = " ".join(arg)
         self.pfeedback('Loading titration from : {source}'.format(source=arg))
-        try:
-            self.titration.load(arg)
+        if self.titration.load(arg, mmap=opts.mmap):
+            self.name = self.titration.name
             self.pfeedback('Now working on : {titration}'.format(titration=self.titration.name))
-        except:
-            return
 
-    @options([], arg_desc="( filtered | selected | complete | incomplete )")
+    def do_job_info(self, arg):
+        "Output metadata of a saved titration project file, without loading it."
+        if not arg:
+            self.do_help('job_info')
+            return
+        try:
+            metadata = read_metadata(arg)
+        except (ValueError, IOError) as error:
+            self.pfeedback(error)
+            return
+        protocole = metadata.get('protocole') or {}
+        self.poutput("\n".join([ "Name :\t\t{name}".format(name=metadata.get('name')),
+                                  "Source dir :\t{dir}".format(dir=metadata.get('working_directory')),
+                                  "Steps :\t\t{steps}".format(steps=len(metadata.get('files', []))),
+                                  "Cut-off :\t{cutoff}".format(cutoff=metadata.get('cutoff')),
+                                  "Volumes :\t{volumes}".format(volumes=protocole.get('add_volumes')) ]))
+
+    @options([], arg_desc="<residue set expression>")
     def do_residues(self, args, opts=None):
-        "Output residues number from predifined sets to standard output."
-        argMap = {
-            "filtered" : self.titration.filtered,
-            "selected" : self.titration.selected,
-            "complete" : self.titration.complete,
-            "incomplete" : self.titration.incomplete
-        }
+        """Output residues number from a residue set expression to standard output.
+        Invocation with no argument lists predefined sets.
+        See `help select` for expressions syntax.
+        """
         if not args:
-            self.poutput("\t".join(list(argMap)))
+            self.poutput("\t".join(self.titration.RESIDUE_SETS))
             return
-        for arg in args:
-            try:
-                if arg not in argMap:
-                    raise ValueError("Skipping invalid argument {arg}.".format(arg=arg))
-                self.poutput(" ".join([str(res.position) for res in argMap[arg].values()]))
-
-            except ValueError as error:
-                self.pfeedback(error)
-                continue
+        try:
+            residues = self.parse_residue_set(args)
+        except ValueError as error:
+            self.pfeedback(error)
+            return
+        self.poutput(" ".join([str(pos) for pos in residues]))
 
     def do_filter(self, args, opts=None):
         "Output residues having their intensity superior or equal to current cutoff."
         self.poutput(" ".join([str(pos) for pos in self.titration.filtered]))
 
-    @options([], arg_desc="[all] [filtered] [complete] [incomplete] [positions_slice]")
+    @options([], arg_desc="<residue set expression>")
     def do_select(self, args, opts=None):
-        """Select a subset of residues, either from :
-         - a predefined set of residues
-         - 1 or more slices of residue positions, with python-ish syntax.
+        """Select a subset of residues, from an expression combining :
+         - predefined sets of residues : all, complete, incomplete, filtered, selected
+         - residue positions or slices of positions, with python-ish syntax.
         Examples :
             ':100' matches positions from start to 100
             '110:117' matches positions from 100 to 117 (excluded)
             '105 112:115' matches positions 105 and 112 to 115 (excluded)
-        You may mix argument types, like select filtered residues + res #100 to #110 excluded :
+        Terms are combined from left to right with operators :
+            & (intersection), + (union), - (difference), ^ (symmetric difference)
+        Adjacent terms are united, like select filtered residues + res #100 to #110 excluded :
             >> select filtered 100:110
+        Or select filtered residues among res #100 to #200 excluded :
+            >> select filtered & 100:200
         Non existant residues are skipped with a warning message.
         Finally, selection is additive only, each selected element adds up to previous selection.
         If you want to clear the current selection, use deselect command.
         """
-        argMap = {
-            "all" : self.titration.residues,
-            "filtered" : self.titration.filtered,
-            "complete" : self.titration.complete,
-            "incomplete" : self.titration.incomplete
-        }
-        selection = []
-        for arg in args:
-            if arg in argMap:
-                args.remove(arg)
-                selection += list(argMap[arg])
-
-        selection += self.parse_residue_slice(args)
+        try:
+            selection = self.parse_residue_set(args)
+        except ValueError as error:
+            self.pfeedback(error)
+            return
         self.titration.select_residues(*selection)
 
 
-    @options([])
+    @options([], arg_desc="<residue set expression>")
     def do_deselect(self, args, opts=None):
-        """Remove a subset of residues from current selection, specifying either :
-         - a predefined set of residues
-         - 1 or more slices of residue positions, with python-ish syntax.
-           e.g : ':100' matches positions from start to 100
-                 '110:117' matches positions from 100 to 117 (excluded)
-                 '105 112:115' matches positions 105 and 112 to 115 (excluded)
-        You may mix argument types, like deselect filtered residues + res #100 to #110 excluded :
+        """Remove a subset of residues from current selection, using the same expressions as `select`
+        e.g deselect filtered residues + res #100 to #110 excluded :
             >> deselect filtered 100:110
         Deselection will silently ignore on currently non-selected residue.
+        Invocation with no argument clears the selection.
         """
-        argMap = {
-            "all" : self.titration.residues,
-            "filtered" : self.titration.filtered,
-            "complete" : self.titration.complete,
-            "incomplete" : self.titration.incomplete
-        }
-        selection = []
-        for arg in args:
-            if arg in argMap:
-                args.remove(arg)
-                selection += list(argMap[arg])
-        selection += self.parse_residue_slice(args)
-        self.titration.deselect_residues(*selection)
+        if not args:
+            self.titration.deselect_residues()
+            return
+        try:
+            selection = self.parse_residue_set(args)
+        except ValueError as error:
+            self.pfeedback(error)
+            return
+        self.titration.deselect_residues(selection.positions)
 
     def do_summary(self, args):
         "Outputs a summary of current titration state."
@@ -300,6 +354,34 @@ class ShiftShell(Cmd):
             self.pfeedback(error)
             self.do_help("cutoff")
 
+    @options([
+        make_option('-w', '--nitrogen-weight', type="float", help="Nitrogen chem shift weight"),
+        make_option('-m', '--mode', choices=["HN", "H", "N"], help="Intensity formula : combined (HN), hydrogen (H) or nitrogen (N) only"),
+        make_option('-g', '--glycines', help="Comma separated glycine positions, using glycine nitrogen weight"),
+        make_option('-G', '--glycine-weight', type="float", help="Glycine nitrogen chem shift weight"),
+        make_option('-r', '--reset', action="store_true", help="Remove per residue nitrogen weights")
+    ])
+    def do_intensity(self, args, opts=None):
+        """Set chemical shift intensity parameters.
+        Invocation with no option outputs current parameters.
+        """
+        try:
+            glycines = [int(pos) for pos in opts.glycines.split(',')] if opts.glycines else None
+        except ValueError as error:
+            self.pfeedback(error)
+            self.do_help("intensity")
+            return
+        if (opts.nitrogen_weight is None and opts.mode is None and glycines is None
+                and opts.glycine_weight is None and not opts.reset):
+            self.poutput(self.titration.table.engine)
+            return
+        engine = self.titration.set_intensity_params(nitrogenWeight=opts.nitrogen_weight,
+                                                     mode=opts.mode,
+                                                     residueWeights=dict() if opts.reset else None,
+                                                     glycines=glycines,
+                                                     glycineWeight=opts.glycine_weight)
+        self.poutput(engine)
+
 ## PLOTTING CMDS ------------------------------
 
     @options([],arg_desc='residue [residue ...]')
@@ -335,22 +417,19 @@ class ShiftShell(Cmd):
         make_option('-s', '--split', action="store_true", help="Sublot each residue individually"),
         make_option('-e', '--export', help="Export 2D shifts map as PNG image")
     ],
-    arg_desc='( complete | filtered | selected )')
+    arg_desc='<residue set expression>')
     def do_shiftmap(self, args, opts=None):
         """Plot chemical shifts for H and N atoms for each residue at all titration steps.
+        Residues are given as a residue set expression, e.g `complete`, `filtered & selected`.
+        See `help select` for expressions syntax.
         """
-        argMap = {
-            "complete" : self.titration.complete,
-            "filtered" : self.titration.filtered,
-            "selected" : self.titration.selected
-        }
         try:
             if not args:
-                self.poutput("\t".join(list(argMap)))
+                self.poutput("\t".join(self.titration.RESIDUE_SETS))
                 return
-            if args[0] not in argMap:
-                raise ValueError("Invalid argument : {arg}. Use `shiftmap -h` for help.".format(arg=args[0]))
-            residues = argMap[args[0]].values()
+            residues = self.parse_residue_set(args).values()
+            if not residues:
+                raise ValueError("No residue to plot.")
             fig = self.titration.plot_shiftmap(residues, split=opts.split)
             if opts.export:
                 fig.figure.savefig(opts.export, dpi=fig.figure.dpi)
@@ -361,31 +440,53 @@ class ShiftShell(Cmd):
 ## --------------------------------------------
 ##      UTILS
 ## --------------------------------------------
-    def parse_residue_slice(self, sliceList):
+    def parse_residue_set(self, args):
         """
-        Parse a list of residue position slices
-        slices are expanded the same as python slice, i.e:
+        Parse a residue set expression, evaluated from left to right.
+        Terms are predefined residue set names, positions or python-ish slices of positions :
             5:8 will yield 5,6,7
             5: will yield all positions from 5 to last.
+        Terms are combined with SET_OPERATORS, with or without spaces, adjacent terms are united :
+            complete-filtered is complete minus filtered.
+        Only the predefined sets used in expression are computed.
+        Returns a ResidueSet. Raises ValueError on invalid expression.
         """
-        selection = []
-        for arg in sliceList:
-            arg = arg.split(':')
-            arg = [ int(subArg) if subArg else None for subArg in arg]
-            if len(arg) > 1:
-                if all(subArg is None for subArg in arg):
-                    break
-                elif arg[0] is None:
-                    selection += range(min(self.titration.residues), arg[1])
-                elif arg[1] is None:
-                    selection += range(arg[0], max(self.titration.residues))
-                else:
-                    selection += range(arg[0], arg[1])
-            elif len(arg) == 1:
-                selection += arg
-            else:
-                break
-        return selection
+        tokens = self.SET_TOKEN_PATTERN.findall(" ".join(args))
+        result = None
+        operation = None
+        for token in tokens:
+            if token in self.SET_OPERATORS:
+                if result is None or operation is not None:
+                    raise ValueError("Misplaced operator {op} in residue set expression.".format(op=token))
+                operation = self.SET_OPERATORS[token]
+                continue
+            term = self.parse_residue_term(token)
+            result = term if result is None else (operation or operator.or_)(result, term)
+            operation = None
+        if operation is not None:
+            raise ValueError("Residue set expression cannot end with an operator.")
+        return result if result is not None else ResidueSet(self.titration.table, self.titration.residues)
+
+    def parse_residue_term(self, term):
+        "Parse a residue set name, position or slice of positions into a ResidueSet"
+        titration = self.titration
+        if term in titration.RESIDUE_SETS:
+            return titration.residue_set(term)
+        bounds = term.split(':')
+        try:
+            bounds = [ int(bound) if bound else None for bound in bounds ]
+        except ValueError:
+            raise ValueError("Invalid residue set term : {term}. Expected one of {names}, a position or a slice.".format(
+                term=term, names=", ".join(titration.RESIDUE_SETS)))
+        if len(bounds) == 2:
+            positions = titration.residue_range(bounds[0], bounds[1])
+        elif len(bounds) == 1 and bounds[0] is not None:
+            positions = bounds
+            if bounds[0] not in titration.residues:
+                self.pfeedback("Residue at position {pos} does not exist. Skipping.".format(pos=bounds[0]))
+        else:
+            raise ValueError("Invalid residue slice : {term}".format(term=term))
+        return ResidueSet.from_positions(titration.table, titration.residues, positions)
 
     def _set_prompt(self):
         """ Set prompt so it displays the current working directory."""
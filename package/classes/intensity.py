@@ -0,0 +1,107 @@
+""" Chemical shift intensity engine
+
+Combines hydrogen and nitrogen chemical shift variations into a single intensity value,
+for whole (steps x residues) matrices at once.
+Formulas :
+    - 'HN' : sqrt(ddH**2 + (w * ddN)**2), w being the nitrogen weight of the residue
+    - 'H'  : |ddH|
+    - 'N'  : |w * ddN|
+Nitrogen weight defaults to 1/5 and may be overridden per residue, e.g for glycines
+which get their own, configurable, glycine weight.
+"""
+
+import numpy as np
+
+
+class IntensityEngine(object):
+    """
+    Class IntensityEngine.
+    `version` is incremented on each parameter change,
+    allowing cached intensities to be invalidated.
+    """
+
+    MODES = ('HN', 'H', 'N')
+    # default nitrogen weight of glycine residues, see set_glycines
+    GLYCINE_N_WEIGHT = 0.2
+
+    def __init__(self, nitrogenWeight=1/5, mode='HN', residueWeights=None):
+        self.version = 0
+        self.nitrogenWeight = 1/5
+        self.mode = 'HN'
+        self.residueWeights = dict() # {position: nitrogen weight}
+        self.glycines = set() # glycine positions, weighted with glycineWeight
+        self.glycineWeight = self.GLYCINE_N_WEIGHT
+        self.set_params(nitrogenWeight=nitrogenWeight, mode=mode, residueWeights=residueWeights)
+
+    def __repr__(self):
+        return ("IntensityEngine(mode={mode}, nitrogenWeight={weight}, glycineWeight={glyWeight}, "
+                "residueWeights={residues})").format(
+            mode=self.mode, weight=self.nitrogenWeight, glyWeight=self.glycineWeight, residues=self.residueWeights)
+
+    def set_params(self, nitrogenWeight=None, mode=None, residueWeights=None):
+        """
+        Sets intensity parameters. None values are left unchanged.
+        `residueWeights` is a dict {position: nitrogen weight}, replacing existing overrides.
+        Raises ValueError on invalid parameters.
+        """
+        if mode is not None and mode not in self.MODES:
+            raise ValueError("Invalid intensity mode {mode}, expected one of {modes}".format(
+                mode=mode, modes=", ".join(self.MODES)))
+        if nitrogenWeight is not None and nitrogenWeight < 0:
+            raise ValueError("Nitrogen weight must be positive")
+        if residueWeights is not None and any(weight < 0 for weight in residueWeights.values()):
+            raise ValueError("Nitrogen weight must be positive")
+
+        if nitrogenWeight is not None:
+            self.nitrogenWeight = float(nitrogenWeight)
+        if mode is not None:
+            self.mode = mode
+        if residueWeights is not None:
+            self.residueWeights = dict((int(pos), float(weight)) for pos, weight in residueWeights.items())
+            self.glycines = set()
+        self.version += 1
+
+    def set_glycines(self, positions=None, weight=None):
+        """
+        Use glycine nitrogen `weight` for residues at `positions`.
+        None `positions` keeps current glycines, None `weight` keeps current glycine weight.
+        Raises ValueError on negative weight.
+        """
+        if weight is not None and weight < 0:
+            raise ValueError("Glycine nitrogen weight must be positive")
+        glycineWeight = self.glycineWeight if weight is None else float(weight)
+        glycines = self.glycines.union(int(pos) for pos in positions or ())
+        residueWeights = dict(self.residueWeights)
+        residueWeights.update((pos, glycineWeight) for pos in glycines)
+        self.set_params(residueWeights=residueWeights)
+        self.glycines = glycines
+        self.glycineWeight = glycineWeight
+
+    def nitrogen_weight(self, position):
+        "Nitrogen weight of residue at `position`"
+        return self.residueWeights.get(position, self.nitrogenWeight)
+
+    def nitrogen_weights(self, positions):
+        "Array of nitrogen weights for residues at sorted `positions`"
+        weights = np.full(len(positions), self.nitrogenWeight)
+        if self.residueWeights and len(positions):
+            overridden = np.fromiter(self.residueWeights.keys(), dtype=np.int64)
+            values = np.fromiter(self.residueWeights.values(), dtype=np.float64)
+            index = np.searchsorted(positions, overridden)
+            found = index < len(positions)
+            found[found] = positions[index[found]] == overridden[found]
+            weights[index[found]] = values[found]
+        return weights
+
+    def compute(self, deltaH, deltaN, positions):
+        """
+        Computes intensities from chem shift variations arrays of shape (steps x residues),
+        for residues at sorted `positions`.
+        """
+        if self.mode == 'H':
+            return np.abs(deltaH)
+        weights = self.nitrogen_weights(positions)
+        if self.mode == 'N':
+            return np.abs(deltaN * weights)
+        with np.errstate(invalid='ignore'):
+            return np.sqrt(deltaH**2 + (deltaN * weights)**2)
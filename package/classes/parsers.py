@@ -0,0 +1,108 @@
+""" Titration files parsers
+
+Bulk parsing of Sparky-like `.list` peak lists into typed arrays.
+A whole file is matched in one pass with a multiline regex,
+then converted to NumPy arrays of positions, H and N chemical shifts.
+Lines are only scanned one by one when the file is malformed, to report the faulty line number.
+"""
+
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+import numpy as np
+
+# bump when parsed output changes, invalidating cached parse results
+PARSER_VERSION = 1
+
+# data lines : position (with optional assignment suffix), N chem shift, H chem shift
+BUFFER_LINE_PATTERN = re.compile(r'^[^\S\n]*(\d+)\S*[^\S\n]+'
+                                 r'(\d+\.\d+)[^\S\n]+'
+                                 r'(\d+\.\d+)[^\S\n]*$', re.MULTILINE)
+# any line starting with a digit is expected to be a data line
+DATA_LINE_PATTERN = re.compile(r'^[^\S\n]*\d', re.MULTILINE)
+
+
+def parse_list(buffer):
+    """
+    Parses a `.list` file content given as a string.
+    Returns a (positions, chemshiftH, chemshiftN) tuple of arrays.
+    Throws ValueError with the line number of the first unparsable line.
+    """
+    matches = BUFFER_LINE_PATTERN.findall(buffer)
+    if len(matches) != len(DATA_LINE_PATTERN.findall(buffer)):
+        raise ValueError("Found unparsable line at line {line}".format(
+            line=find_unparsable_line(buffer)))
+    if not matches:
+        return (np.empty(0, dtype=np.int64),
+                np.empty(0, dtype=np.float64),
+                np.empty(0, dtype=np.float64))
+    positions, chemshiftN, chemshiftH = zip(*matches)
+    return (np.array(positions).astype(np.int64),
+            np.array(chemshiftH).astype(np.float64),
+            np.array(chemshiftN).astype(np.float64))
+
+
+def find_unparsable_line(buffer):
+    "Returns number, starting from 1, of first line starting with a digit and not matching data line format"
+    for lineNb, line in enumerate(buffer.split('\n'), 1):
+        if DATA_LINE_PATTERN.match(line) and not BUFFER_LINE_PATTERN.match(line):
+            return lineNb
+
+
+def read_list_file(filePath):
+    "Reads and parses `.list` file at `filePath`, see parse_list"
+    with open(filePath, 'r') as listStream:
+        return parse_list(listStream.read())
+
+
+def timed_read_list_file(filePath, cache=None):
+    """
+    Reads and parses `.list` file at `filePath`, measuring elapsed time.
+    If a ParseCache is given, parsed data is read from and stored in it.
+    Returns a (chemshifts, seconds) tuple. Parse or file errors are returned in place of chemshifts.
+    """
+    start = time.perf_counter()
+    try:
+        chemshifts = cache.read(filePath) if cache is not None else read_list_file(filePath)
+    except (ValueError, IOError) as error:
+        chemshifts = error
+    return chemshifts, time.perf_counter() - start
+
+
+def read_list_files(filePaths, jobs=None, cache=None):
+    """
+    Parses `.list` files on a pool of `jobs` processes (defaults to CPU count).
+    With `jobs` set to 1, files are parsed one after the other in current process.
+    Yields (filePath, chemshifts, seconds) tuples in `filePaths` order, as soon as available.
+    Only a few files per process are submitted ahead, so that when iteration stops early,
+    e.g loading is cancelled, remaining files are not parsed.
+    """
+    filePaths = list(filePaths)
+    readFile = partial(timed_read_list_file, cache=cache)
+    if jobs == 1 or len(filePaths) < 2:
+        for filePath in filePaths:
+            yield (filePath, ) + readFile(filePath)
+    else:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        remaining = iter(filePaths)
+        submitted = deque((filePath, pool.submit(readFile, filePath))
+                          for filePath in islice(remaining, 2 * (jobs or os.cpu_count() or 1)))
+        try:
+            while submitted:
+                filePath, future = submitted.popleft()
+                chemshifts, elapsed = future.result()
+                # keep processes busy while caller handles this file
+                for nextPath in islice(remaining, 1):
+                    submitted.append((nextPath, pool.submit(readFile, nextPath)))
+                yield filePath, chemshifts, elapsed
+        finally:
+            for filePath, future in submitted:
+                future.cancel()
+            pool.shutdown(wait=True)
+    if cache is not None:
+        cache.evict()
@@ -1,8 +1,13 @@
 import matplotlib.pyplot as plt
 import numpy as np
-from classes.widgets import CutOffCursor
+from matplotlib.collections import PolyCollection
+from matplotlib.colors import to_rgba
+from matplotlib.transforms import Bbox
+from .ThresholdIndex import ThresholdIndex
+from .binning import bin_centers, bin_max, bin_starts, bin_width
+from .widgets import CutOffCursor
 from math import *
-from matplotlib.ticker import FormatStrFormatter
+from matplotlib.ticker import FormatStrFormatter, MaxNLocator, MultipleLocator
 
 
 class BaseFig(object):
@@ -12,8 +17,8 @@ class BaseFig(object):
         "Init new figure"
         self.figure = plt.figure()
         self.closed = True
-        self.xaxis = list(xaxis) if xaxis else None
-        self.yaxis = list(yaxis) if yaxis else None
+        self.xaxis = list(xaxis) if xaxis is not None else None
+        self.yaxis = list(yaxis) if yaxis is not None else None
         self.setup_axes()
 
     def show(self):
@@ -49,21 +54,48 @@ class BaseFig(object):
 
 
 
+def bar_vertices(xaxis, heights, width=0.8):
+    "(bars x 4 x 2) array of rectangle vertices for bars centered on `xaxis`. Missing heights are drawn flat."
+    xaxis = np.asarray(xaxis, dtype=np.float64)
+    heights = np.nan_to_num(np.asarray(heights, dtype=np.float64))
+    vertices = np.zeros((len(xaxis), 4, 2))
+    vertices[:, (0, 1), 0] = (xaxis - width / 2)[:, np.newaxis]
+    vertices[:, (2, 3), 0] = (xaxis + width / 2)[:, np.newaxis]
+    vertices[:, (1, 2), 1] = heights[:, np.newaxis]
+    return vertices
+
+
 class BaseHist(BaseFig):
     """
     Base histogram class, providing interface to a matplotlib figure.
+    Bars of each subplot are drawn as a single PolyCollection,
+    colored from a facecolors array.
+    With `levelOfDetail`, residues are binned when there are more residues than pixels
+    in visible range, showing max intensity of each bin. Bins are refined when zooming in.
     """
 
     cutoff = None # flag for open/closed state
+    barColor = to_rgba('C0')
+    filteredColor = to_rgba('orange')
 
-    def __init__(self, xaxis, yaxis):
+    def __init__(self, xaxis, yaxis, levelOfDetail=True):
         "Init new matplotlib figure, setup widget, events, and layout"
 
         # Tick every 10
         self.positionTicks=range(min(xaxis) - max(xaxis) % 5, max(xaxis)+10, 10)
-        self.filtered = dict()
-        self.bars = list()
+        self.positions = np.asarray(xaxis)
+        self.levelOfDetail = levelOfDetail
+        self.binWidth = None # positions per bar, None when drawing a bar per residue
+        self.binStarts = None # index of first residue of each bin
+        self.heights = list() # residues heights of each subplot
+        self.bars = list() # bars collection of each subplot
+        self.facecolors = list() # (bars x RGBA) colors array of each subplot
+        self.thresholdIndexes = list() # bars sort order of each subplot
+        self.filteredMasks = list() # bars filtered state of each subplot
+        self.drawnCutoffs = list() # cut off used for coloring each subplot
         super().__init__(xaxis, yaxis)
+        if levelOfDetail:
+            self.set_detail(self.detail_width())
 
         self.xlabel = self.figure.axes[-1].set_xlabel('Residue')
         self.ylabel = self.figure.text(0.04, 0.5, 'Chem Shift Intensity',
@@ -71,8 +103,15 @@ class BaseHist(BaseFig):
 
         # Init cursor widget and connect it
         self.init_cursor()
+        self.textBackground = None # static background behind cut off text, when blitting
+        self.textBbox = None
         self.init_events()
+        for ax in self.figure.axes:
+            ax.callbacks.connect('xlim_changed', self.update_detail)
+        self.figure.canvas.mpl_connect('resize_event', lambda event: self.update_detail())
         self.cutoffText = self.figure.text(0.13, 0.9, self.cutoff_str)
+        # when blitting, cut off text is drawn over cached background only
+        self.cutoffText.set_animated(self.cursor.useblit)
 
         # initial draw
         self.figure.canvas.draw()
@@ -86,9 +125,24 @@ class BaseHist(BaseFig):
 
     def on_draw(self, event):
         "Prevent cut off hiding, e.g on window resize"
+        if self.cursor.useblit:
+            # cache figure strip above axes, holding cut off text
+            textTop = self.cutoffText.get_window_extent(event.renderer).y0 - 2
+            axesTop = max(ax.bbox.y1 for ax in self.figure.axes)
+            self.textBbox = Bbox.from_extents(self.figure.bbox.x0, max(textTop, axesTop),
+                                              self.figure.bbox.x1, self.figure.bbox.y1)
+            self.textBackground = self.figure.canvas.copy_from_bbox(self.textBbox)
+            self.draw_cutoff_text()
         self.cursor.visible = True
         self.cursor.update_lines(None, self.cutoff)
 
+    def draw_cutoff_text(self):
+        "Redraw cut off text over its cached background"
+        canvas = self.figure.canvas
+        canvas.restore_region(self.textBackground)
+        self.figure.draw_artist(self.cutoffText)
+        canvas.blit(self.textBbox)
+
     def init_cursor(self):
         """
         Init cursor widget and connect it to self.on_cutoff_update
@@ -125,22 +179,125 @@ class BaseHist(BaseFig):
         if not self.closed:
             self.cursor.set_cutoff(cutoff)
 
+    def add_bars(self, ax, heights):
+        "Plot bars of `heights` on subplot `ax` as a single collection"
+        if self.levelOfDetail and not self.bars:
+            # first guess from data span, refined once axes limits are set
+            self.set_detail(bin_width(np.ptp(self.positions) + 1, ax.bbox.width))
+        self.heights.append(np.asarray(heights, dtype=np.float64))
+        bars = PolyCollection([], edgecolors='none', antialiased=False,
+                              zorder=2.6) # over spines, so that redrawing bars alone is exact
+        self.bars.append(bars)
+        self.facecolors.append(None)
+        self.thresholdIndexes.append(None)
+        self.filteredMasks.append(None)
+        self.drawnCutoffs.append(None)
+        self.rebuild_bars(len(self.bars) - 1)
+        ax.add_collection(bars)
+        ax.autoscale_view(scaley=False)
+        return bars
+
+    def display_bars(self, heights):
+        "Returns (xaxis, heights, width) of bars drawn for residues `heights` at current level of detail"
+        if self.binWidth is None:
+            return self.positions, heights, 0.8
+        return (bin_centers(self.positions, self.binWidth, self.binStarts),
+                bin_max(heights, self.binStarts),
+                0.8 * self.binWidth)
+
+    def rebuild_bars(self, axIndex):
+        "Sets bars geometry, sort order and colors of subplot `axIndex` from residues heights"
+        xaxis, heights, width = self.display_bars(self.heights[axIndex])
+        self.bars[axIndex].set_verts(bar_vertices(xaxis, heights, width))
+        self.thresholdIndexes[axIndex] = ThresholdIndex(heights)
+        filteredMask = self.filteredMasks[axIndex] = self.thresholdIndexes[axIndex].mask(self.cutoff)
+        self.facecolors[axIndex] = np.where(filteredMask[:, np.newaxis], self.filteredColor, self.barColor)
+        self.bars[axIndex].set_facecolor(self.facecolors[axIndex])
+        self.drawnCutoffs[axIndex] = self.cutoff
+
+    def detail_width(self, ax=None):
+        "Bin width for visible positions range and axes width, None when each residue fits in a pixel"
+        if not self.levelOfDetail:
+            return None
+        ax = ax or self.figure.axes[0]
+        xmin, xmax = ax.get_xlim()
+        return bin_width(xmax - xmin, ax.bbox.width)
+
+    def update_detail(self, ax=None):
+        """
+        Bins residues according to visible positions range and width of `ax` (first subplot by default),
+        e.g on zoom or window resize. Returns True if bars changed.
+        """
+        binWidth = self.detail_width(ax)
+        if binWidth == self.binWidth:
+            return False
+        self.set_detail(binWidth)
+        return True
+
+    def set_detail(self, binWidth):
+        "Draws bars for bins of `binWidth` positions, or for each residue if None"
+        self.binWidth = binWidth
+        self.binStarts = bin_starts(self.positions, binWidth) if binWidth else None
+        for axIndex in range(len(self.bars)):
+            self.rebuild_bars(axIndex)
+        for ax in self.figure.axes:
+            # only visible ticks are created, a tick every 10 residues when they fit
+            ax.xaxis.set_major_locator(MultipleLocator(10) if binWidth is None else MaxNLocator(integer=True))
+
+    def set_heights(self, heights, axIndex=0):
+        """
+        Updates bars heights of subplot `axIndex` with new intensities, e.g when step data changed.
+        Bars are recolored and canvas is redrawn when idle.
+        """
+        if len(self.bars) == 1:
+            self.yaxis = list(heights)
+        else:
+            self.yaxis[axIndex] = list(heights)
+        self.heights[axIndex] = np.asarray(heights, dtype=np.float64)
+        self.rebuild_bars(axIndex)
+        # bars geometry changed, cached backgrounds are stale
+        self.figure.canvas.draw()
+
+    def toggle_bars(self, axIndex, indexes):
+        "Switch filtered state and color of bars at `indexes` in subplot `axIndex`"
+        filteredMask, facecolors = self.filteredMasks[axIndex], self.facecolors[axIndex]
+        filteredMask[indexes] = ~filteredMask[indexes]
+        # show high intensity residues
+        facecolors[indexes] = np.where(filteredMask[indexes, np.newaxis], self.filteredColor, self.barColor)
+        self.bars[axIndex].set_facecolor(facecolors)
+
     def draw(self):
         """
         Updates bars color according to current cut off value.
+        Only bars crossing cut off since last draw are recolored, found by binary search.
         """
-        for ax, axBar in zip(self.figure.axes, self.bars):
-            for bar in axBar:
-                if self.cutoff:
-                    if bar.get_height() >= self.cutoff: # show high intensity residues
-                        if not self.filtered.get(bar):
-                            bar.set_facecolor('orange')
-                            self.filtered[bar] = 1
-                    else:
-                        if self.filtered.get(bar):
-                            bar.set_facecolor(None)
-                            self.filtered[bar] = 0
-        self.figure.canvas.draw()
+        changedBars = []
+        for axIndex, thresholdIndex in enumerate(self.thresholdIndexes):
+            crossed = thresholdIndex.crossed(self.drawnCutoffs[axIndex], self.cutoff)
+            self.toggle_bars(axIndex, crossed)
+            self.drawnCutoffs[axIndex] = self.cutoff
+            changedBars.append(crossed)
+        self.blit(changedBars)
+
+    def blit(self, changedBars):
+        """
+        Redraws only subplots with recolored bars, cut off text and cursor lines over cached axes backgrounds.
+        `changedBars` holds indexes of changed bars for each subplot.
+        Falls back to a full canvas draw when blitting is not available.
+        """
+        if not self.cursor.useblit or not self.cursor.backgrounds or self.textBackground is None:
+            self.figure.canvas.draw()
+            return
+        canvas = self.figure.canvas
+        for axIndex, indexes in enumerate(changedBars):
+            if not len(indexes):
+                continue
+            canvas.restore_region(self.cursor.backgrounds[axIndex])
+            self.figure.axes[axIndex].draw_artist(self.bars[axIndex])
+            # recolored bars are now part of static background
+            self.cursor.refresh_background(axIndex)
+        self.draw_cutoff_text()
+        self.cursor._update()
 
 
 class Hist(BaseHist):
@@ -148,11 +305,11 @@ class Hist(BaseHist):
     BaseHist child class for plotting single histogram
     """
 
-    def __init__(self, xaxis, yaxis, step=None):
+    def __init__(self, xaxis, yaxis, step=None, levelOfDetail=True):
         """
         Sets title
         """
-        super().__init__(xaxis, yaxis)
+        super().__init__(xaxis, yaxis, levelOfDetail=levelOfDetail)
         if step:
             self.figure.suptitle('Titration step {step}'.format(step=step) )# set title
 
@@ -162,11 +319,11 @@ class Hist(BaseHist):
         """
         self.figure.subplots(nrows=1, ncols=1, squeeze=True)
         ax = self.figure.axes[0]
-        ax.set_xticks(self.positionTicks)
+        if not self.levelOfDetail:
+            ax.set_xticks(self.positionTicks)
         maxVal = np.amax(self.yaxis)
         ax.set_ylim(0, np.round(maxVal + maxVal*0.1, decimals=1))
-        #self.background.append(self.figure.canvas.copy_from_bbox(ax.bbox))
-        self.bars.append(ax.bar(self.xaxis, self.yaxis, align='center', alpha=1))
+        self.add_bars(ax, self.yaxis)
 
 
 
@@ -175,11 +332,11 @@ class MultiHist(BaseHist):
     BaseHist child class for plotting stacked hists.
     """
 
-    def __init__(self, xaxis, yMatrix):
+    def __init__(self, xaxis, yMatrix, levelOfDetail=True):
         """
         Sets title
         """
-        super().__init__(xaxis, yMatrix)
+        super().__init__(xaxis, yMatrix, levelOfDetail=levelOfDetail)
         self.figure.suptitle('Titration : steps 1 to {last}'.format(last=len(yMatrix) ) )
         self.figure.text(0.96, 0.5, 'Titration step',
                         va='center', rotation='vertical')
@@ -191,15 +348,15 @@ class MultiHist(BaseHist):
                             sharex=True, sharey=True, squeeze=True)
         # Set content and layout for each subplot.
         for index, ax in enumerate(self.figure.axes):
-            ax.set_xticks(self.positionTicks)
+            if not self.levelOfDetail:
+                ax.set_xticks(self.positionTicks)
             maxVal = np.amax(self.yaxis)
             ax.set_ylim(0, np.round(maxVal + maxVal*0.1, decimals=1))
             stepLabel = "{step}.".format(step=str(index+1))
             ax.set_ylabel(stepLabel, rotation="horizontal", labelpad=15)
             ax.yaxis.set_label_position('right')
             #ax.yaxis.label.set_color('red')
-            #self.background.append(self.figure.canvas.copy_from_bbox(ax.bbox))
-            self.bars.append(ax.bar(self.xaxis, self.yaxis[index], align='center', alpha=1))
+            self.add_bars(ax, self.yaxis[index])
         #self.figure.subplots_adjust(left=0.15)
 
 
@@ -0,0 +1,136 @@
+""" Shift2Me project files
+
+Binary container for saved titrations, replacing pickle.
+Layout is :
+    - magic bytes and format version
+    - JSON header, holding metadata and a description (dtype, shape, offset) of each block
+    - contiguous, aligned raw array blocks
+Header can be read alone, allowing to inspect a project without loading its data.
+Only plain numeric arrays and JSON are read back, so opening untrusted files does not execute code.
+"""
+
+import json
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b'SHIFT2ME'
+FORMAT_VERSION = 1
+# header : magic, format version, JSON header length
+PREAMBLE = struct.Struct('<8sII')
+# blocks start on aligned offsets
+ALIGNMENT = 64
+# accepted dtype kinds : bool, signed/unsigned int, float
+DTYPE_KINDS = 'biuf'
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def save_project(path, arrays, metadata):
+    """
+    Write `arrays` dict {name: ndarray} and JSON serializable `metadata` dict to `path`.
+    """
+    arrays = dict((name, np.ascontiguousarray(array)) for name, array in arrays.items())
+    for name, array in arrays.items():
+        if array.dtype.kind not in DTYPE_KINDS:
+            raise ValueError("Cannot save block {name} of type {dtype}".format(
+                name=name, dtype=array.dtype))
+
+    # compute blocks layout, offsets are relative to data section
+    blocks = dict()
+    offset = 0
+    for name, array in arrays.items():
+        blocks[name] = {
+            'dtype' : array.dtype.newbyteorder('<').str,
+            'shape' : list(array.shape),
+            'offset' : offset
+        }
+        offset = _align(offset + array.nbytes)
+
+    header = json.dumps({
+        'version' : FORMAT_VERSION,
+        'metadata' : metadata,
+        'blocks' : blocks
+    }).encode('utf-8')
+    dataStart = _align(PREAMBLE.size + len(header))
+
+    with open(path, 'wb') as projectHandle:
+        projectHandle.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        projectHandle.write(header)
+        for name, array in arrays.items():
+            projectHandle.seek(dataStart + blocks[name]['offset'])
+            projectHandle.write(array.astype(blocks[name]['dtype'], copy=False).tobytes())
+    return path
+
+
+def read_header(path):
+    """
+    Read and validate project header at `path`.
+    Returns header dict with block offsets made absolute.
+    Raises ValueError if file is not a valid project file.
+    """
+    fileSize = os.path.getsize(path)
+    with open(path, 'rb') as projectHandle:
+        preamble = projectHandle.read(PREAMBLE.size)
+        if len(preamble) < PREAMBLE.size:
+            raise ValueError("{file} is not a Shift2Me project file".format(file=path))
+        magic, version, headerSize = PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise ValueError("{file} is not a Shift2Me project file".format(file=path))
+        if version > FORMAT_VERSION:
+            raise ValueError("{file} uses project format version {version}, newer than supported version {supported}".format(
+                file=path, version=version, supported=FORMAT_VERSION))
+        if PREAMBLE.size + headerSize > fileSize:
+            raise ValueError("{file} has a truncated header".format(file=path))
+        try:
+            header = json.loads(projectHandle.read(headerSize).decode('utf-8'))
+        except ValueError as headerError:
+            raise ValueError("{file} has a corrupted header : {error}".format(
+                file=path, error=headerError))
+
+    dataStart = _align(PREAMBLE.size + headerSize)
+    for name, block in header.get('blocks', {}).items():
+        try:
+            dtype = np.dtype(str(block['dtype']))
+        except TypeError:
+            dtype = np.dtype(object)
+        if dtype.kind not in DTYPE_KINDS:
+            raise ValueError("Invalid type {dtype} for block {name}".format(dtype=dtype, name=name))
+        block['offset'] = dataStart + int(block['offset'])
+        block['shape'] = tuple(int(dim) for dim in block['shape'])
+        if any(dim < 0 for dim in block['shape']) \
+                or block['offset'] + dtype.itemsize * int(np.prod(block['shape'])) > fileSize:
+            raise ValueError("Block {name} exceeds file {file} size".format(name=name, file=path))
+    return header
+
+
+def read_metadata(path):
+    "Returns metadata dict of project at `path`, without reading data blocks"
+    return read_header(path).get('metadata', {})
+
+
+def load_project(path, blocks=None, mmap=False):
+    """
+    Load project at `path`.
+    Returns a (arrays, metadata) tuple. If `blocks` names are given, only those arrays are read.
+    With `mmap`, arrays are read-only memory maps on the file : data is only read from disk when accessed.
+    """
+    header = read_header(path)
+    names = header['blocks'] if blocks is None else blocks
+    arrays = dict()
+    with open(path, 'rb') as projectHandle:
+        for name in names:
+            if name not in header['blocks']:
+                raise ValueError("{file} does not contain block {name}".format(file=path, name=name))
+            block = header['blocks'][name]
+            count = int(np.prod(block['shape']))
+            if mmap and count:
+                arrays[name] = np.memmap(path, dtype=block['dtype'], mode='r',
+                                         offset=block['offset'], shape=block['shape'])
+            else:
+                projectHandle.seek(block['offset'])
+                arrays[name] = np.fromfile(projectHandle, dtype=block['dtype'], count=count).reshape(block['shape'])
+    return arrays, header.get('metadata', {})
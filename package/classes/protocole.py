@@ -2,8 +2,9 @@ import glob
 import sys
 import os
 from collections import OrderedDict
+from contextlib import contextmanager
 
-import pandas as pd
+import numpy as np
 import yaml
 import json
 
@@ -11,8 +12,17 @@ represent_dict_order = lambda self, data: self.represent_mapping('tag:yaml.org,2
 """ setup YAML for ordered dict output : https://stackoverflow.com/a/8661021 """
 yaml.add_representer(OrderedDict, represent_dict_order)
 
-# Setup pandas float precision
-pd.set_option('precision', 3)
+# pandas is imported on first dataframe access, see _pandas()
+pd = None
+
+def _pandas():
+    "Imports pandas on first use, setting up float precision"
+    global pd
+    if pd is None:
+        import pandas
+        pandas.set_option('precision', 3)
+        pd = pandas
+    return pd
 
 
 ## --------------------------------------------------------------------
@@ -44,7 +54,12 @@ class StockSolution(object):
         return self
 
 class TitrationProtocole(object):
-    "A titration protocole tracker, wrapping around a pandas dataframe"
+    """
+    A titration protocole tracker.
+    Protocole columns are stored as a preallocated (steps x columns) array growing geometrically,
+    derived columns are recomputed from the first edited step only.
+    A pandas dataframe view is built on demand.
+    """
 
     INIT_FIELDS=('name', 'analyte', 'titrant', 'start_volume', 'add_volumes')
     COLUMN_ALIASES = ('vol_add', 'vol_titrant', 'vol_total', 'conc_titrant', 'conc_analyte', 'ratio', 'step', )
@@ -68,13 +83,23 @@ class TitrationProtocole(object):
         # Initial analyte volume in total volume
         self.analyteStartVol = 0
 
+        # Protocole columns, first `steps` rows are used
+        self._data = np.zeros((8, len(self.COLUMN_ALIASES)))
+        self.steps = 0
+        self._staleStep = 0 # first step which derived columns are outdated
+        self._params = None # parameters used for derived columns
+        self._df = None # cached dataframe view
+        self.col_aliases = dict(zip(self.COLUMN_ALIASES, self.COLUMN_ALIASES))
+
+        # Edits batches, see batch()
+        self._batchDepth = 0
+        self._batchEdits = set() # names of parameters edited in current batch
+        self._batchSnapshot = None # state restored if current batch fails
+        self.listeners = [] # callables notified after each change
+
         # Added titrant volumes : 0 for first step
         self.volumes = [0]
 
-        # Initialize protocole dataframe
-        self._df = pd.DataFrame(index=list(range(len(self.volumes))) or [0], columns=self.COLUMN_ALIASES, data=0)
-        self.col_aliases = dict(zip(self.COLUMN_ALIASES, self._df.columns))
-
         # Load YAML file or arg dictionnary
         if initStream is not None: # init from file
             self.load_init_file(initStream)
@@ -84,48 +109,130 @@ class TitrationProtocole(object):
 
 
 ## ----------------------------------------------------------
-##      Protocole using pandas
+##      Protocole columns
 ## ----------------------------------------------------------
 
+    def _column(self, item):
+        "Column number from column alias or header"
+        if item in self.col_aliases:
+            return self.COLUMN_ALIASES.index(item)
+        for column, header in enumerate(self.col_aliases[alias] for alias in self.COLUMN_ALIASES):
+            if header == item:
+                return column
+        raise KeyError(item)
+
     def __getitem__(self, item):
         "Get item from data frame using column alias"
-        if item in self.col_aliases:
-            return self._df[self.col_aliases[item]]
-        else:
-            return self._df[item]
+        return self.df[self.df.columns[self._column(item)]]
 
     def __setitem__(self, item, value):
-        "Set item from data frame using column alias"
-        if item in self.col_aliases:
-            self._df[self.col_aliases[item]] = value
-        else:
-            self._df[item] = value
+        """
+        Set column values using column alias.
+        Derived columns are recomputed and listeners notified, as for other edits.
+        """
+        column = self._column(item)
+        with self.batch():
+            self._data[:self.steps, column] = value
+            if column == 0:
+                self._staleStep = 0
+            self._df = None
 
     @property
     def df(self):
-        "Property for getting inner dataframe"
+        "Property for getting protocole dataframe"
+        if self._df is None:
+            self._df = _pandas().DataFrame(self._data[:self.steps].copy(),
+                                    columns=[self.col_aliases[alias] for alias in self.COLUMN_ALIASES])
+            self._df[self.col_aliases['step']] = self._df[self.col_aliases['step']].astype(int)
         return self._df
 
+    @property
+    def values(self):
+        "(steps x columns) array of protocole columns"
+        return self._data[:self.steps]
+
+    @property
+    def volumes(self):
+        "Added titrant volumes list, 0 for first step"
+        return self._data[:self.steps, 0].tolist()
+
+    @volumes.setter
+    def volumes(self, volumes):
+        self.steps = 0
+        self._append_volumes(volumes)
+
+    def _reserve(self, steps):
+        "Grow columns capacity geometrically to hold at least `steps` steps"
+        capacity = len(self._data)
+        if steps > capacity:
+            while capacity < steps:
+                capacity *= 2
+            data = np.zeros((capacity, self._data.shape[1]))
+            data[:self.steps] = self._data[:self.steps]
+            self._data = data
+
+    def _append_volumes(self, volumes):
+        "Adds steps with `volumes`, derived columns are outdated from first added step"
+        volumes = np.asarray(volumes, dtype=np.float64).ravel()
+        self._reserve(self.steps + len(volumes))
+        self._data[self.steps:self.steps + len(volumes), 0] = volumes
+        self._staleStep = min(self._staleStep, self.steps)
+        self.steps += len(volumes)
+        self._df = None
+
+    def load_values(self, values, columns=None):
+        """
+        Restores protocole columns from a saved (steps x columns) `values` array,
+        and their `columns` headers if given. Raises ValueError if `values` shape is invalid.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim != 2 or values.shape[1] != len(self.COLUMN_ALIASES):
+            raise ValueError("Invalid protocole columns of shape {shape}".format(shape=values.shape))
+        if columns is not None and len(columns) != len(self.COLUMN_ALIASES):
+            raise ValueError("Invalid protocole headers : {columns}".format(columns=columns))
+        with self.batch():
+            self.steps = 0
+            self._reserve(len(values))
+            self._data[:len(values)] = values
+            self.steps = len(values)
+            # saved derived columns are up to date with current parameters
+            self._staleStep = self.steps
+            self._params = (self.startVol, self.analyteStartVol, self.titrant.concentration, self.analyte.concentration)
+            self._df = None
+        if columns is not None:
+            self.col_aliases = dict(zip(self.COLUMN_ALIASES, map(str, columns)))
+
     def update(self, index=True):
-        "Rebuild dataframe from current volumes list"
-        # self._df = pd.DataFrame(
-        #     index=list(range(len(self.volumes))) or [0],
-        #     columns=self.COLUMN_ALIASES,
-        #     data=0)
-        self.fill_df()
-        #self.set_headers()
-        return self._df
+        "Recompute derived columns from current volumes, returns dataframe"
+        with self.batch():
+            pass
+        return self.df
 
-    def fill_df(self):
-        "Fill dataframe columns"
-        print(self.titrant, self.analyte)
-        self._df['step'] = list(range(len(self.volumes)))
-        self._df['vol_add'] = self.volumes
-        self._df['vol_titrant'] = self._df['vol_add'].cumsum()
-        self._df['vol_total'] = self.startVol + self._df['vol_titrant']
-        self._df['conc_titrant'] = self._df['vol_titrant'] * self.titrant.concentration / self._df['vol_total']
-        self._df['conc_analyte'] = self.analyteStartVol * self.analyte.concentration / self._df['vol_total']
-        self._df['ratio'] = self._df['conc_titrant'] / self._df['conc_analyte']
+    def fill_df(self, start=None):
+        """
+        Fill derived columns, from `start` step or from first outdated step.
+        All steps are recomputed when concentrations or initial volumes changed.
+        """
+        params = (self.startVol, self.analyteStartVol, self.titrant.concentration, self.analyte.concentration)
+        if params != self._params:
+            start = 0
+        elif start is None:
+            start = self._staleStep
+        self._params = params
+        self._staleStep = self.steps
+        if start >= self.steps:
+            return
+        (volAdd, volTitrant, volTotal, concTitrant, concAnalyte, ratio, step) = self._data[start:self.steps].T
+        previous = self._data[start - 1, 1] if start > 0 else 0
+        np.cumsum(volAdd, out=volTitrant)
+        volTitrant += previous
+        np.add(self.startVol, volTitrant, out=volTotal)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            np.divide(volTitrant * self.titrant.concentration, volTotal, out=concTitrant)
+            np.divide(self.analyteStartVol * self.analyte.concentration, volTotal, out=concAnalyte)
+            np.divide(concTitrant, concAnalyte, out=ratio)
+        step[:] = np.arange(start, self.steps)
+        self._df = None
 
     def set_headers(self):
         """Set more expressive column headers for display
@@ -146,8 +253,75 @@ class TitrationProtocole(object):
             ]))
         # update aliases
         self.col_aliases = dict(zip(self.COLUMN_ALIASES, headers))
+        self.col_aliases['step'] = 'step'
         # update headers
-        self._df.columns = list(headers)
+        self._df = None
+
+## -----------------------------------------------------
+##         Edits batches
+## -----------------------------------------------------
+
+    @contextmanager
+    def batch(self):
+        """
+        Groups protocole edits, e.g
+            with protocole.batch():
+                protocole.set_initial_volume(500)
+                protocole.update_volumes({1: 10, 2: 20})
+        Edits are validated, derived columns recomputed and listeners notified once,
+        when leaving outermost batch. If an edit or validation fails, all edits of the batch are reverted.
+        Batches may be nested.
+        """
+        if not self._batchDepth:
+            self._batchSnapshot = self._snapshot()
+            self._batchEdits = set()
+        self._batchDepth += 1
+        try:
+            yield self
+            if self._batchDepth == 1:
+                self.check_edits(self._batchEdits)
+        except Exception:
+            if self._batchDepth == 1:
+                self._restore(self._batchSnapshot)
+            raise
+        finally:
+            self._batchDepth -= 1
+        if not self._batchDepth:
+            self._batchSnapshot = None
+            self.fill_df()
+            self.notify()
+
+    def check_edits(self, edits):
+        "Validates parameters named in `edits`, raising ValueError if invalid"
+        if 'analyteStartVol' in edits and self.analyteStartVol <= 0:
+            raise ValueError("Analyte volume must be strictly positive")
+        if 'startVol' in edits and self.startVol < self.analyteStartVol:
+            raise ValueError("Total volume must be greater or equal to analyte volume")
+
+    def _snapshot(self):
+        "Protocole state, stock solutions are kept with their attributes as they may be replaced or edited"
+        stocks = tuple((stock, dict(vars(stock))) for stock in (self.titrant, self.analyte))
+        return (self._data.copy(), self.steps, self._staleStep, self._params,
+                self.startVol, self.analyteStartVol, stocks)
+
+    def _restore(self, snapshot):
+        (self._data, self.steps, self._staleStep, self._params,
+         self.startVol, self.analyteStartVol, stocks) = snapshot
+        for stock, attributes in stocks:
+            vars(stock).update(attributes)
+        (self.titrant, _), (self.analyte, _) = stocks
+        self._df = None
+
+    def add_listener(self, listener):
+        "Calls `listener` with protocole after each change, or batch of changes"
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+    def notify(self):
+        for listener in list(self.listeners):
+            listener(self)
 
 ## -----------------------------------------------------
 ##         Input/output
@@ -270,17 +444,18 @@ class TitrationProtocole(object):
         #set name
         self.set_name(initDict.get('name'))
 
-        # titrant, analyte initial names and concentration
-        self.titrant = StockSolution.from_dict(initDict['titrant'])
-        self.analyte = StockSolution.from_dict(initDict['analyte'])
-        for initConcentration in (self.titrant, self.analyte):
-            initConcentration['concentration'] = float(initConcentration['concentration'])
+        with self.batch():
+            # titrant, analyte initial names and concentration
+            self.titrant = StockSolution.from_dict(initDict['titrant'])
+            self.analyte = StockSolution.from_dict(initDict['analyte'])
+            for initConcentration in (self.titrant, self.analyte):
+                initConcentration.setConcentration(float(initConcentration.concentration))
 
-        # initial volumes
-        self.analyteStartVol = float(initDict['start_volume']['analyte'])
-        self.startVol = float(initDict['start_volume']['total'])
-        # added titrant volumes
-        self.set_volumes(initDict.get('add_volumes', self.volumes))
+            # initial volumes
+            self.analyteStartVol = float(initDict['start_volume']['analyte'])
+            self.startVol = float(initDict['start_volume']['total'])
+            # added titrant volumes
+            self.set_volumes(initDict.get('add_volumes', self.volumes))
 
         # validate parameters
         self.isInit = self.validate()
@@ -311,46 +486,57 @@ class TitrationProtocole(object):
 
     def set_volumes(self, volumes):
         "Set tiration volumes, updating steps to match number of volumes"
+        volumes = list(map(float, volumes))
         if volumes[0] != 0:
             volumes.insert(0,0)
-        self.volumes = list(map(float, volumes))
-        self.update()
+        with self.batch():
+            self.volumes = volumes
 
     def update_volumes(self, stepVolumes):
-        "Updates protocole volumes from a dict \{step_nb: volume\}"
-        try:
+        """
+        Updates protocole volumes from a dict \{step_nb: volume\}.
+        Raises IndexError if a step does not exist, no volume is then updated.
+        """
+        with self.batch():
             for step, vol in stepVolumes.items():
-                self.volumes[step] = vol
-        except IndexError:
-            print("{step} does not exist".format(step=step), file=sys.stderr)
+                if not -self.steps <= step < self.steps:
+                    raise IndexError("Step {step} does not exist".format(step=step))
+                step = step % self.steps
+                self._data[step, 0] = vol
+                self._staleStep = min(self._staleStep, step)
+                self._df = None
 
     def add_volume(self, volume):
         "Add a volume for next protocole step"
-        self.volumes.append(volume)
-        self._df = self.df.append(dict.fromkeys(self.COLUMN_ALIASES, 0), ignore_index=True)
-        print(self.df)
-        self.update()
+        with self.batch():
+            self._append_volumes([volume])
 
     def add_volumes(self, volumes):
         "Add a list of volumes for next protocole steps"
-        self.volumes += volumes
-        self.update()
+        with self.batch():
+            self._append_volumes(volumes)
 
     def set_analyte_volume(self, volume):
-        if volume <= 0:
-            raise ValueError("Analyte volume must be strictly positive")
-        else:
+        "Sets initial analyte volume, validated at end of batch"
+        with self.batch():
             self.analyteStartVol = volume
-            print(self.analyteStartVol)
-            self.update()
-    
+            self._batchEdits.add('analyteStartVol')
+
     def set_initial_volume(self, volume):
-        if volume < self.analyteStartVol:
-            raise ValueError("Total volume must be greater or equal to analyte volume")
-        else:
+        "Sets initial total volume, validated at end of batch"
+        with self.batch():
             self.startVol = volume
-            print(self.startVol)
-            self.update()
+            self._batchEdits.add('startVol')
+
+    def set_titrant_concentration(self, concentration):
+        with self.batch():
+            if not self.titrant.setConcentration(concentration):
+                raise ValueError("Titrant concentration must be positive")
+
+    def set_analyte_concentration(self, concentration):
+        with self.batch():
+            if not self.analyte.setConcentration(concentration):
+                raise ValueError("Analyte concentration must be positive")
 
 ## -----------------------------------------------------
 ##         Properties
@@ -362,8 +548,14 @@ class TitrationProtocole(object):
         initDict=OrderedDict({"_description" : "This file defines a titration's initial parameters."})
         unordered = {
             'name' : self.name,
-            'titrant' : self.titrant,
-            'analyte' : self.analyte,
+            'titrant' : {
+                "name" : self.titrant.name,
+                "concentration" : self.titrant.concentration
+            },
+            'analyte' : {
+                "name" : self.analyte.name,
+                "concentration" : self.analyte.concentration
+            },
             'start_volume': {
                 "analyte" : self.analyteStartVol,
                 "total" : self.startVol
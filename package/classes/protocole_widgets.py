@@ -410,10 +410,22 @@ class ProtocolePanel(TitrationWidget, PanelContainer):
 
         PanelContainer.__init__(self, heading=[self.title],  *args, **kwargs)
 
+        self._protocole = None # protocole listened to
         self.update()
 
     def update(self, change=None):
-        self.table = HTML(self.titration.protocole.update(index=False).to_html(index=False))
+        "Listens to titration protocole, which is replaced when a new titration is uploaded"
+        protocole = self.titration.protocole
+        if protocole is not self._protocole:
+            if self._protocole is not None:
+                self._protocole.remove_listener(self.show_protocole)
+            protocole.add_listener(self.show_protocole)
+            self._protocole = protocole
+        self.show_protocole(protocole)
+
+    def show_protocole(self, protocole):
+        "Protocole listener, renders protocole table"
+        self.table = HTML(protocole.df.to_html(index=False))
         self.table._dom_classes += ('rendered_html', 'protocole-table')
         self.set_content([self.table])
 
@@ -425,15 +437,11 @@ class ProtocoleContainer(HBox):
         HBox.__init__(self, *args, **kwargs, layout=Layout(justify_content='space-around'))
 
         self.volumes = VolumePanel(layout=Layout(width='30%', height="auto"))
-        self.volumes.add_observer(self.on_submit)
-
+        # protocole panel listens to submitted volumes changes
         self.protocole = ProtocolePanel(layout=Layout(width='68%', height="auto"))
 
         self.children = (self.volumes, self.protocole)
 
-    def on_submit(self, button):
-        self.protocole.update()
-
     def update(self, change=None):
         self.volumes.update()
         self.protocole.update()
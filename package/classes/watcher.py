@@ -0,0 +1,72 @@
+""" Directory watcher
+
+Low overhead polling of a titration directory, detecting new or modified `.list` files
+while the spectrometer writes them.
+Each poll is a single `os.scandir` of the directory, comparing (size, mtime) signatures.
+A file is only reported once its signature is stable across two polls,
+so that files still being written are not parsed half-way.
+Reported files are reported again at each poll until acknowledged as ingested,
+e.g a step written before the previous one is retried once the previous one is ingested.
+"""
+
+import fnmatch
+import os
+
+
+class DirectoryWatcher(object):
+    """
+    Class DirectoryWatcher.
+    Reports new or changed files matching `pattern` in `directory`.
+    Files listed in `known` are considered as already ingested in their current state.
+    """
+
+    def __init__(self, directory, pattern='*.list', known=()):
+        self.directory = os.path.abspath(directory)
+        self.pattern = pattern
+        self._seen = dict() # {path: signature} at last poll
+        self._reported = dict() # {path: signature} when last acknowledged
+        self.pending = False # some files are changing
+        known = set(map(os.path.abspath, known))
+        for path, signature in self.scan().items():
+            if path in known:
+                self._reported[path] = signature
+
+    def scan(self):
+        "Returns {path: (size, mtime)} for files matching pattern"
+        signatures = dict()
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not fnmatch.fnmatch(entry.name, self.pattern):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError: # removed meanwhile
+                    continue
+                signatures[entry.path] = (stat.st_size, stat.st_mtime_ns)
+        return signatures
+
+    def poll(self):
+        """
+        Returns sorted list of files which are new or changed since last acknowledged, and stable since last poll.
+        Use acknowledge with files ingested successfully, other files are reported again at next poll.
+        """
+        current = self.scan()
+        changed = []
+        self.pending = False
+        for path, signature in current.items():
+            if self._reported.get(path) == signature:
+                continue
+            if self._seen.get(path) == signature:
+                changed.append(path)
+            else:
+                self.pending = True
+        self._seen = current
+        return sorted(changed)
+
+    def acknowledge(self, paths):
+        "Marks files at `paths` as ingested, in their state at last poll"
+        for path in map(os.path.abspath, paths):
+            if path in self._seen:
+                self._reported[path] = self._seen[path]
@@ -32,6 +32,7 @@ class MultiDraggableCursor(MultiCursor):
     """
     def __init__(self, canvas, axes, useblit=True, horizOn=False, vertOn=True, **lineprops):
         self.press = None
+        self.backgrounds = None # static background of each axis, when blitting
         super().__init__(canvas, axes, useblit, horizOn, vertOn, **lineprops)
 
     def connect(self):
@@ -52,10 +53,16 @@ class MultiDraggableCursor(MultiCursor):
         if self.ignore(event):
             return
         if self.useblit:
-            self.background = (self.canvas.copy_from_bbox(self.canvas.figure.bbox))
+            # cursor lines are animated, hence not part of cached backgrounds
+            self.backgrounds = [self.canvas.copy_from_bbox(ax.bbox) for ax in self.axes]
         for line in self.vlines + self.hlines:
             line.set_visible(False)
 
+    def refresh_background(self, axIndex):
+        "Cache current content of axis `axIndex` as its background, e.g after redrawing some of its artists"
+        if self.useblit and self.backgrounds:
+            self.backgrounds[axIndex] = self.canvas.copy_from_bbox(self.axes[axIndex].bbox)
+
     def event_accept(self, event):
         "Check if event capturing is allowed"
         if self.ignore(event):
@@ -108,15 +115,16 @@ class MultiDraggableCursor(MultiCursor):
     def _update(self):
         "Update canvas"
         if self.useblit:
-            if self.background is not None:
-                self.canvas.restore_region(self.background)
-            if self.vertOn:
-                for ax, line in zip(self.axes, self.vlines):
-                    ax.draw_artist(line)
-            if self.horizOn:
-                for ax, line in zip(self.axes, self.hlines):
-                    ax.draw_artist(line)
-            self.canvas.blit(self.canvas.figure.bbox)
+            if not self.backgrounds:
+                return
+            # only blit axes, each one over its own background
+            for axIndex, ax in enumerate(self.axes):
+                self.canvas.restore_region(self.backgrounds[axIndex])
+                if self.vertOn:
+                    ax.draw_artist(self.vlines[axIndex])
+                if self.horizOn:
+                    ax.draw_artist(self.hlines[axIndex])
+                self.canvas.blit(ax.bbox)
         else:
             self.canvas.draw_idle()
 
@@ -6,22 +6,37 @@ import numpy as np
 from PyQt5 import QtCore
 from PyQt5.QtChart import (QBarCategoryAxis, QBarSeries, QBarSet, QChart,
                            QLineSeries, QStackedBarSeries,)
-from PyQt5.QtCore import QObject, pyqtSlot
+from PyQt5.QtCore import QObject, QSignalBlocker, pyqtSlot
 from PyQt5.QtGui import QBrush, QColor, QFont, QIcon, QPainter, QPen
 
+from package.classes.ThresholdIndex import ThresholdIndex
+from package.classes.binning import bin_max, bin_starts, bin_width
+
 
 class BarChartController(QObject):
 
+    # minimum bar width, residues are binned when more bars would be shown
+    BAR_PIXELS = 3
+    # above this number of bars crossing cut off, both bar sets are rebuilt at once
+    MAX_SWITCHED_BARS = 32
+
     def __init__(self, window, titration = None):
         super().__init__(window)
 
         self.parent = window
+        self.titration = None
 
         self.slider = window.ui.cutoffSlider
         self.floatbox = window.ui.cutoffSpinBox
         self.stepSlider = window.ui.stepSlider
         self.chartview = window.ui.chartview
 
+        self.values = np.zeros(0) # shown bars values
+        self.categories = [] # shown bars labels
+        self.thresholdIndex = ThresholdIndex(self.values)
+        self.cutoff = None # cut off used for current bars state
+        self.sliderScale = 1.0 # cut off value of one slider unit
+
         self.slider.valueChanged.connect(self.set_cutoff)
         self.stepSlider.valueChanged.connect(self.plot)
         self.floatbox.valueChanged.connect(self.set_cutoff)
@@ -29,46 +44,119 @@ class BarChartController(QObject):
         self.init_chart()
         self.set_cutoff(50)
 
+    def set_titration(self, titration):
+        """
+        Display complete residues intensities of `titration`,
+        at step selected with step slider.
+        """
+        self.titration = titration
+        self.stepSlider.setMaximum(max(titration.dataSteps - 1, 1))
+        intensities = titration.intensities
+        maxIntensity = float(np.nanmax(intensities)) if intensities.size else 0.0
+        if maxIntensity > 0:
+            # slider and spin box span intensities range,
+            # clamping their values must not override titration cut off
+            self.sliderScale = maxIntensity / self.slider.maximum()
+            blocker = QSignalBlocker(self.floatbox)
+            self.floatbox.setDecimals(3)
+            self.floatbox.setSingleStep(self.sliderScale)
+            self.floatbox.setMaximum(maxIntensity)
+            blocker.unblock()
+        self.plot()
+        if titration.cutoff is not None:
+            self.set_cutoff(titration.cutoff)
+
     @pyqtSlot("int")
     @pyqtSlot("double")
     def set_cutoff(self, cutoff):
         sender = self.sender()
         if (sender == self.slider):
+            cutoff = cutoff * self.sliderScale
+        # sync other widget without re-entering, cut off is applied once
+        if (sender != self.floatbox):
+            blocker = QSignalBlocker(self.floatbox)
             self.floatbox.setValue(cutoff)
-        elif (sender == self.floatbox):
-            self.slider.setValue(cutoff)
-        else:
-            self.floatbox.setValue(cutoff)
-            self.slider.setValue(cutoff)
+            blocker.unblock()
+            # spin box may round cut off to its decimals
+            cutoff = self.floatbox.value()
+        if (sender != self.slider):
+            blocker = QSignalBlocker(self.slider)
+            self.slider.setValue(round(cutoff / self.sliderScale))
+            blocker.unblock()
+        if cutoff == self.cutoff:
+            return
         self.move_line(cutoff)
 
-        for index in range(100):
-            if self.barset.at(index) >= cutoff or (self.selected.at(index) < cutoff and self.selected.at(index) > 0):
+        # only bars crossing cut off since last update are switched
+        crossed = self.thresholdIndex.crossed(self.cutoff, cutoff)
+        self.cutoff = cutoff
+        if self.titration is not None:
+            self.titration.set_cutoff(cutoff)
+        if len(crossed) > self.MAX_SWITCHED_BARS:
+            self.fill_bars()
+        else:
+            for index in crossed.tolist():
                 self.switch_bar(index)
-    
+
     def switch_bar(self, index):
         value = self.barset.at(index)
         self.barset.replace(index, self.selected.at(index))
         self.selected.replace(index, value)
 
     @pyqtSlot("int")
-    def plot(self, value = None):
-        
-        for index, val in enumerate(np.random.randint(0, 100, 100)):
-            
-            if val > self.floatbox.value():
-                self.selected.replace(index, val)
-                self.barset.replace(index, 0)
-            else:
-                self.barset.replace(index, val)
-                self.selected.replace(index, 0)
+    def plot(self, step = None):
+        "Show intensities at titration `step`, defaulting to step slider value"
+        if self.titration is None or not self.titration.dataSteps:
+            self.set_values(np.zeros(0), np.zeros(0))
+            return
+        step = self.stepSlider.value() if step is None else step
+        step = min(step, self.titration.dataSteps - 1)
+        table = self.titration.table
+        self.set_values(table.positions[table.complete], table.intensity_row(step)[table.complete])
+
+    def set_values(self, positions, values):
+        """
+        Show `values` of residues at sorted `positions`.
+        When there are more residues than bars fitting in chart view width,
+        residues are binned, showing max value of each bin.
+        """
+        positions = np.asarray(positions)
+        values = np.asarray(values, dtype=np.float64)
+        categories = [str(pos) for pos in positions.tolist()]
+        binWidth = bin_width(np.ptp(positions) + 1 if len(positions) else 0,
+                             self.chartview.width() // self.BAR_PIXELS)
+        if binWidth:
+            starts = bin_starts(positions, binWidth)
+            ends = np.append(starts[1:], len(positions)) - 1
+            values = bin_max(values, starts)
+            categories = ["{first}-{last}".format(first=first, last=last)
+                          for first, last in zip(positions[starts].tolist(), positions[ends].tolist())]
+        self.values = np.nan_to_num(values)
+        self.thresholdIndex = ThresholdIndex(values)
+        self.cutoff = self.floatbox.value()
+
+        if categories != self.categories:
+            self.categories = categories
+            self.axisX.clear()
+            self.axisX.append(categories)
+        self.fill_bars()
+        self.move_line(self.cutoff)
+
+    def fill_bars(self):
+        "Rebuild both bar sets contents at once from shown values and cut off"
+        filteredMask = self.thresholdIndex.mask(self.cutoff)
+        for barset, heights in ((self.barset, np.where(filteredMask, 0, self.values)),
+                                (self.selected, np.where(filteredMask, self.values, 0))):
+            if barset.count():
+                barset.remove(0, barset.count())
+            barset.append(heights.tolist())
 
 
     def move_line(self, yVal):
         #print(yVal)
         #print(self.sender())
-        self.lineSeries.replace(0, QtCore.QPoint(0, yVal))
-        self.lineSeries.replace(1, QtCore.QPoint(100, yVal))
+        self.lineSeries.replace(0, QtCore.QPointF(0, yVal))
+        self.lineSeries.replace(1, QtCore.QPointF(max(len(self.values), 1), yVal))
 
     @pyqtSlot("bool", "int")
     def bar_info(self, status, index):
@@ -76,8 +164,8 @@ class BarChartController(QObject):
             self.parent.statusBar().clearMessage()
         else:
             value = max(self.selected.at(index), self.barset.at(index))
-            self.parent.statusBar().showMessage("Index : {index} ; {delta} = {value}".format(
-                index=index, delta= u"\u03B4", value = str(value)))
+            self.parent.statusBar().showMessage("Residue : {residue} ; {delta} = {value}".format(
+                residue=self.categories[index], delta= u"\u03B4", value = str(value)))
 
         
 
@@ -90,12 +178,6 @@ class BarChartController(QObject):
         self.barset.hovered.connect(self.bar_info)
         self.selected.hovered.connect(self.bar_info)
 
-        for index, val in enumerate(np.random.randint(0, 100, 100)):
-            self.barset << 0
-            self.selected << 0
-
-        self.plot()
-
         self.series = QStackedBarSeries()
         self.series.setBarWidth(0.5)
         self.series.append(self.barset)
@@ -114,11 +196,10 @@ class BarChartController(QObject):
         self.lineSeries.append(QtCore.QPoint(0,0))
         self.lineSeries.append(QtCore.QPoint(100,0))
 
-        # setup X axis
-        categories = list(str(val) for val in range(100))
+        # setup X axis, categories are set when plotting
         axis = QBarCategoryAxis()
-        axis.append(categories)
         axis.setLabelsAngle(90)
+        self.axisX = axis
         #axis.setLabelsFont(QFont("free", 8))
 
         # Create chart
@@ -138,3 +219,5 @@ class BarChartController(QObject):
         # insert in UI
         self.chartview.setChart(self.chart)
         self.chartview.setRenderHint(QPainter.Antialiasing)
+
+        self.plot()
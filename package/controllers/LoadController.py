@@ -0,0 +1,133 @@
+"""A controller loading titration directories off the GUI thread
+"""
+
+import glob
+import os
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal, pyqtSlot
+
+from package.classes.Titration import Titration
+
+
+class LoaderSignals(QObject):
+    "Signals of a TitrationLoader, QRunnable not being a QObject"
+
+    # (file, done, total)
+    progress = pyqtSignal(str, int, int)
+    # loaded titration
+    loaded = pyqtSignal(object)
+    # error message
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+
+class TitrationLoader(QRunnable):
+    """
+    Loads `.list` files and protocole init file from `directory` into a new Titration, in a thread pool.
+    Progress is reported after each parsed file. Once cancelled,
+    loading stops before next file and the titration is discarded.
+    Any error is reported with `failed` signal, so that waiting GUI is always released.
+    """
+
+    def __init__(self, directory, jobs=1, cache=None):
+        super().__init__()
+        self.directory = directory
+        self.jobs = jobs
+        self.cache = cache
+        self.signals = LoaderSignals()
+        self.isCancelled = False
+
+    def cancel(self):
+        self.isCancelled = True
+
+    def run(self):
+        try:
+            titration = Titration(name=os.path.basename(os.path.normpath(self.directory)), cache=self.cache)
+            titration.set_directory(self.directory)
+            files = glob.glob(os.path.join(self.directory, '*.list'))
+            if not files:
+                raise IOError("Directory {dir} does not contain any `.list` titration file.".format(
+                    dir=self.directory))
+            files = sorted(files, key=titration.validate_filepath)
+            titration.load_files(files, jobs=self.jobs,
+                                 callback=self.signals.progress.emit,
+                                 cancelled=lambda: self.isCancelled)
+            initFile = titration.protocole.extract_init_file(self.directory)
+            if initFile:
+                titration.protocole.load_init_path(initFile)
+            # compute intensities before handing titration to GUI thread
+            titration.table.intensities
+        except (IOError, ValueError) as error:
+            self.signals.failed.emit(str(error))
+            return
+        except Exception as error:
+            self.signals.failed.emit("Could not load {dir} : {error}".format(
+                dir=self.directory, error=repr(error)))
+            return
+        if self.isCancelled:
+            self.signals.cancelled.emit()
+        else:
+            self.signals.loaded.emit(titration)
+
+
+class LoadController(QObject):
+    """
+    Runs one TitrationLoader at a time on the global thread pool,
+    starting a new load cancels the running one.
+    """
+
+    # (file, done, total)
+    progress = pyqtSignal(str, int, int)
+    # (titration, directory)
+    loaded = pyqtSignal(object, str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, window, jobs=1, cache=None):
+        super().__init__(window)
+
+        self.pool = QThreadPool.globalInstance()
+        self.jobs = jobs
+        self.cache = cache
+        self.loader = None
+
+    def load(self, directory):
+        "Load titration from `directory` in background"
+        self.cancel()
+        loader = self.loader = TitrationLoader(directory, jobs=self.jobs, cache=self.cache)
+        loader.signals.progress.connect(self.on_progress)
+        loader.signals.loaded.connect(self.on_loaded)
+        loader.signals.failed.connect(self.on_failed)
+        self.pool.start(loader)
+
+    @pyqtSlot()
+    def cancel(self):
+        "Cancel running load, if any"
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader = None
+
+    @property
+    def loading(self):
+        return self.loader is not None
+
+    def _is_current(self):
+        # signals of cancelled loaders may still be queued
+        return self.loader is not None and self.sender() is self.loader.signals
+
+    @pyqtSlot(str, int, int)
+    def on_progress(self, file, done, total):
+        if self._is_current():
+            self.progress.emit(file, done, total)
+
+    @pyqtSlot(object)
+    def on_loaded(self, titration):
+        if self._is_current():
+            directory = self.loader.directory
+            self.loader = None
+            self.loaded.emit(titration, directory)
+
+    @pyqtSlot(str)
+    def on_failed(self, message):
+        if self._is_current():
+            self.loader = None
+            self.failed.emit(message)
@@ -1,4 +1,7 @@
-from PyQt5.QtCore import QObject, Qt, QPoint
+import sys
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, Qt, QPoint, QSignalBlocker, QTimer
 from PyQt5.QtWidgets import QDoubleSpinBox, QHeaderView
 
 from PyQt5.QtChart import (QBarCategoryAxis, QBarSeries, QBarSet, QChart, QAreaSeries,
@@ -11,11 +14,22 @@ from package.delegates.SpinBoxDelegate import SpinBoxDelegate
 
 class ProtocoleController(QObject):
 
+    # delay (ms) during which parameter changes are merged into one update
+    UPDATE_DELAY = 50
+
     def __init__(self, parent):
         super().__init__(parent)
 
+        # pending parameter changes {setter: value}, applied at once after UPDATE_DELAY
+        self.pendingParams = OrderedDict()
+        self.updateTimer = QTimer(self)
+        self.updateTimer.setSingleShot(True)
+        self.updateTimer.setInterval(self.UPDATE_DELAY)
+        self.updateTimer.timeout.connect(self.apply_pending)
+
         self.protocole = TitrationProtocole()
-        self.protocole.update()
+        # derived columns only, dataframe is built when needed so that pandas is not imported at start up
+        self.protocole.fill_df()
         self.protocoleModel = ProtocoleModel(self.protocole, self)
         parent.ui.protocoleTable.setModel(self.protocoleModel)
         self.delegate = SpinBoxDelegate()
@@ -42,8 +56,21 @@ class ProtocoleController(QObject):
 
         parent.ui.addStepBtn.clicked.connect(self.add_step)
 
+        # {setter: (spin box, protocole value getter)}, to reset spin boxes of rejected values
+        self.paramBoxes = {
+            self.protocole.set_titrant_concentration : (parent.ui.titrantConc,
+                                                        lambda: self.protocole.titrant.concentration),
+            self.protocole.set_analyte_concentration : (parent.ui.analyteConc,
+                                                        lambda: self.protocole.analyte.concentration),
+            self.protocole.set_analyte_volume : (parent.ui.analyteInitialVolume,
+                                                 lambda: self.protocole.analyteStartVol),
+            self.protocole.set_initial_volume : (parent.ui.totalInitialVolume,
+                                                 lambda: self.protocole.startVol),
+        }
+
         self.protocoleModel.modelReset.connect(self.onModelReset)
-        self.protocoleModel.rowsInserted.connect(self.onModelReset)
+        self.protocoleModel.rowsInserted.connect(self.onRowsInserted)
+        self.protocoleModel.dataChanged.connect(self.update_charts)
 
 
 
@@ -161,10 +188,21 @@ class ProtocoleController(QObject):
             yield self.protocoleModel.data(self.protocoleModel.index(row, 0), Qt.DisplayRole)
 
     def onModelReset(self):
-        for row in range(1, self.protocoleModel.rowCount()):
-            index = self.protocoleModel.index(row, 0)
-            self.table.openPersistentEditor(index)
+        # view closes all editors on reset
+        self.open_editors(1, self.protocoleModel.rowCount() - 1)
+        self.update_charts()
 
+    def onRowsInserted(self, parent, first, last):
+        self.open_editors(max(first, 1), last)
+        self.update_charts()
+
+    def open_editors(self, first, last):
+        "Open volume spin boxes from `first` to `last` rows, first step volume is not editable"
+        for row in range(first, last + 1):
+            self.table.openPersistentEditor(self.protocoleModel.index(row, 0))
+
+    def update_charts(self):
+        "Rescale charts axes to protocole values"
         self.volumeChart.axisX().setRange(0, self.protocoleModel.rowCount()-1)
         self.volumeChart.axisX().setTickCount(self.protocoleModel.rowCount())
 
@@ -177,29 +215,55 @@ class ProtocoleController(QObject):
             self.protocoleModel.data(self.protocoleModel.index(self.protocoleModel.rowCount()-1, 3)).value(),
             self.protocoleModel.data(self.protocoleModel.index(0,4)).value()
             ))
-        print(self.volumeSeries.pointsVector())
+
+    def schedule(self, setter, value):
+        """
+        Calls `setter` with `value` at next update.
+        Successive values for the same setter are coalesced, only last one is applied.
+        """
+        self.pendingParams[setter] = value
+        self.updateTimer.start()
+
+    def apply_pending(self):
+        """
+        Apply pending parameter changes in one protocole batch,
+        protocole model notifies changed cells once.
+        If a change is invalid, changes are applied one by one so that valid ones are kept,
+        and spin boxes of rejected ones show protocole values again.
+        """
+        pending, self.pendingParams = self.pendingParams, OrderedDict()
+        try:
+            with self.protocole.batch():
+                for setter, value in pending.items():
+                    setter(value)
+            return
+        except ValueError:
+            pass
+        for setter, value in pending.items():
+            try:
+                setter(value)
+            except ValueError as error:
+                print("{error}".format(error=error), file=sys.stderr)
+                self.reset_param(setter)
+
+    def reset_param(self, setter):
+        "Show protocole value of parameter set by `setter` in its spin box, without scheduling it again"
+        spinBox, value = self.paramBoxes[setter]
+        blocker = QSignalBlocker(spinBox)
+        spinBox.setValue(value())
+        blocker.unblock()
 
     def set_analyte_volume(self, volume):
-        self.protocoleModel.modelAboutToBeReset.emit()
-        self.protocole.set_analyte_volume(volume)
-        self.protocoleModel.modelReset.emit()
+        self.schedule(self.protocole.set_analyte_volume, volume)
 
     def set_initial_volume(self, volume):
-        self.protocoleModel.modelAboutToBeReset.emit()
-        self.protocole.set_initial_volume(volume)
-        self.protocoleModel.modelReset.emit()
+        self.schedule(self.protocole.set_initial_volume, volume)
 
     def set_analyte_concentration(self, concentration):
-        self.protocoleModel.modelAboutToBeReset.emit()
-        self.protocole.analyte.setConcentration(concentration)
-        self.protocole.update()
-        self.protocoleModel.modelReset.emit()
+        self.schedule(self.protocole.set_analyte_concentration, concentration)
 
     def set_titrant_concentration(self, concentration):
-        self.protocoleModel.modelAboutToBeReset.emit()
-        self.protocole.titrant.setConcentration(concentration)
-        self.protocole.update()
-        self.protocoleModel.modelReset.emit()
+        self.schedule(self.protocole.set_titrant_concentration, concentration)
 
     def add_step(self):
         self.protocoleModel.insertRows(self.protocoleModel.rowCount(), 1)
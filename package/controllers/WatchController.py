@@ -0,0 +1,71 @@
+"""A controller watching titration directory for steps written by the spectrometer
+"""
+
+
+from PyQt5.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal, pyqtSlot
+
+from package.classes.watcher import DirectoryWatcher
+
+
+class WatchController(QObject):
+    """
+    Ingests new or changed `.list` files into a titration while they are written.
+    QFileSystemWatcher notifies directory changes (through inotify where available),
+    a short single shot timer then lets files settle before they are parsed.
+    """
+
+    # (added files, replaced files)
+    titrationUpdated = pyqtSignal(list, list)
+
+    def __init__(self, window, interval=500):
+        super().__init__(window)
+
+        self.titration = None
+        self.watcher = None
+
+        self.fsWatcher = QFileSystemWatcher(self)
+        self.fsWatcher.directoryChanged.connect(self.schedule)
+        self.fsWatcher.fileChanged.connect(self.schedule)
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.poll)
+
+    def watch(self, titration, directory):
+        "Start watching `directory`, ingesting changes into `titration`"
+        self.stop()
+        self.titration = titration
+        self.watcher = DirectoryWatcher(directory, known=titration.files)
+        self.fsWatcher.addPath(self.watcher.directory)
+        if titration.files:
+            self.fsWatcher.addPaths(titration.files)
+
+    def stop(self):
+        "Stop watching"
+        self.timer.stop()
+        watched = self.fsWatcher.directories() + self.fsWatcher.files()
+        if watched:
+            self.fsWatcher.removePaths(watched)
+        self.watcher = None
+
+    @pyqtSlot(str)
+    def schedule(self, path=None):
+        "Delay polling until files stop changing"
+        if self.watcher is not None:
+            self.timer.start()
+
+    @pyqtSlot()
+    def poll(self):
+        changed = self.watcher.poll()
+        if changed:
+            added, replaced = self.titration.update_files(changed)
+            # rejected files, e.g written before previous step, are retried at next poll
+            self.watcher.acknowledge(added + replaced)
+            # files may be replaced rather than rewritten, watch them again
+            if added or replaced:
+                self.fsWatcher.addPaths(added + replaced)
+            self.titrationUpdated.emit(added, replaced)
+        # some files are still being written
+        if self.watcher.pending:
+            self.timer.start()
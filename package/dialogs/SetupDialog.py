@@ -1,18 +1,61 @@
+import sys
+
 import qtawesome as qta
 from PyQt5 import QtGui, QtWidgets
 from PyQt5.QtCore import pyqtSlot as Slot
-from PyQt5.QtCore import QDir, Qt
+from PyQt5.QtCore import QDir, QObject, QRunnable, Qt, QThreadPool, pyqtSignal
 
 from package.delegates.SpinBoxDelegate import SpinBoxDelegate
 # from qtpandas.models.DataFrameModel import DataFrameModel
 # from qtpandas.views.DataTableView import DataTableWidget
 #from qtpandas.models.SupportedDtypes import SupportedDtypes
-from package.models.DataFrameModel import DataFrameModel
+from package.models.DataFrameModel import DataFrameModel, read_csv
 from package.ui.ui_setupdialog import Ui_Dialog
 from package.widgets.AtomComboWidget import AtomComboWidget
 
 
+class PreviewSignals(QObject):
+    # (request id, DataFrame)
+    loaded = pyqtSignal(int, object)
+    # (request id, error message)
+    failed = pyqtSignal(int, str)
+
+
+class PreviewLoader(QRunnable):
+    """
+    Reads first `nrows` rows of a file in a thread pool.
+    A cancelled loader which did not start yet does not read anything.
+    """
+
+    def __init__(self, requestId, filePath, header, nrows):
+        super().__init__()
+        self.requestId = requestId
+        self.filePath = filePath
+        self.header = header
+        self.nrows = nrows
+        self.signals = PreviewSignals()
+        self.isCancelled = False
+
+    def cancel(self):
+        self.isCancelled = True
+
+    def run(self):
+        if self.isCancelled:
+            return
+        try:
+            df = read_csv(self.filePath, self.header, nrows=self.nrows)
+        except (IOError, ValueError) as error:
+            self.signals.failed.emit(self.requestId, str(error))
+            return
+        if not self.isCancelled:
+            self.signals.loaded.emit(self.requestId, df)
+
+
 class SetupDialog(QtWidgets.QDialog):
+
+    # number of rows shown in file preview
+    PREVIEW_ROWS = 100
+
     def __init__(self):
         super().__init__()
         self.ui = Ui_Dialog()
@@ -37,6 +80,11 @@ class SetupDialog(QtWidgets.QDialog):
             self.ui.nitrogenColumn
             ]
             
+        self.directory = None # chosen titration directory
+        self.previewPool = QThreadPool(self)
+        self.previewPool.setMaxThreadCount(1)
+        self.previewLoader = None # loader of latest requested preview
+        self.previewRequests = 0
         self.ui.headerCheckbox.stateChanged.connect(self.reload_preview)
         print(QDir.currentPath())
         self.setwd(QDir.currentPath())
@@ -66,14 +114,36 @@ class SetupDialog(QtWidgets.QDialog):
         self.load_csv(selected)
 
     def load_csv(self, modelIndex): 
+        "Preview first rows of file at `modelIndex` in background, cancelling previous preview"
         useHeaders = 'infer' if self.ui.headerCheckbox.isChecked() else None
-        self.fileModel.load_csv(filePath = self.dirModel.filePath(modelIndex),  header = useHeaders)
+        if self.previewLoader is not None:
+            self.previewLoader.cancel()
+        self.previewRequests += 1
+        loader = self.previewLoader = PreviewLoader(self.previewRequests, self.dirModel.filePath(modelIndex),
+                                                    useHeaders, self.PREVIEW_ROWS)
+        loader.signals.loaded.connect(self.on_preview_loaded)
+        loader.signals.failed.connect(self.on_preview_failed)
+        self.previewPool.start(loader)
+
+    def is_latest_preview(self, requestId):
+        return self.previewLoader is not None and requestId == self.previewLoader.requestId
+
+    def on_preview_loaded(self, requestId, df):
+        if not self.is_latest_preview(requestId):
+            return
+        useHeaders = self.previewLoader.header
+        self.previewLoader = None
+        self.fileModel.set_df(df)
         if useHeaders:
             options = self.fileModel.df.columns.tolist()
         else:
             options = [ "Col {}".format(idx) for idx in range(len(self.fileModel.df.columns))]
         self.update_options(options)
-        print("kanar", self.fileModel.df.columns.tolist())
+
+    def on_preview_failed(self, requestId, message):
+        if self.is_latest_preview(requestId):
+            self.previewLoader = None
+            print(message, file=sys.stderr)
 
         
     def browse(self, event):
@@ -84,6 +154,7 @@ class SetupDialog(QtWidgets.QDialog):
         return directory
 
     def setwd(self, directory):
+        self.directory = directory
         self.parentIndex = self.dirModel.setRootPath(directory)
         #self.dirModel.setCurrentIndex(self.parentIndex)
         print(self.dirModel.filePath(self.parentIndex))
@@ -1,46 +1,95 @@
-import pandas as pd
+import numpy as np
 from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt, QVariant
 from PyQt5.QtGui import QFont, QBrush, QColor
 from PyQt5.QtWidgets import QPushButton
-from package.classes.protocole import TitrationProtocole
+
+def read_csv(filePath, header, nrows=None):
+    "Reads whitespace separated table at `filePath`, parsing only its first `nrows` rows if given"
+    import pandas as pd
+    with open(filePath, "r") as fh:
+        return pd.read_table(fh, sep='\\s+', header=header, nrows=nrows)
+
 
 class DataFrameModel(QAbstractTableModel):
 
     def __init__(self, parent=None, editable = False):
         super().__init__(parent)
 
-        self._df = pd.DataFrame()
+        self._df = None # no DataFrame until a file is loaded
         self.editable = editable
-        
-        
+
+        # cached cells and labels, rebuilt on first access after any change
+        self._cacheValid = False
+        self._shape = (0, 0)
+        self._cells = np.empty((0, 0), dtype=object)
+        self._columnLabels = []
+        self._indexLabels = []
+        for signal in (self.modelReset, self.dataChanged, self.layoutChanged,
+                       self.rowsInserted, self.rowsRemoved,
+                       self.columnsInserted, self.columnsRemoved):
+            signal.connect(self.invalidate_cache)
+
     @property
     def df(self):
         return self._df
 
-    def load_csv(self, filePath, header):
-        with open(filePath, "r") as fh:
-            self._df = pd.read_table(fh, sep='\\s+', header=header)
-            self.modelReset.emit()
+    def invalidate_cache(self, *args):
+        self._cacheValid = False
+
+    def update_cache(self):
+        "Rebuild cells and labels caches from DataFrame if needed"
+        if self._cacheValid:
+            return
+        self._cells = self.format_cells()
+        self._shape = self._cells.shape
+        self._columnLabels = self.format_columns()
+        self._indexLabels = self.format_index()
+        self._cacheValid = True
+
+    def format_cells(self):
+        "2D array of displayed cells values"
+        if self.df is None:
+            return np.empty((0, 0), dtype=object)
+        return self.df.astype(str).values
+
+    def format_columns(self):
+        "List of displayed column labels"
+        return [str(col) for col in self.df.columns.tolist()] if self.df is not None else []
+
+    def format_index(self):
+        "List of displayed row labels"
+        return [str(row) for row in self.df.index.tolist()] if self.df is not None else []
+
+    def load_csv(self, filePath, header, nrows=None):
+        self.set_df(read_csv(filePath, header, nrows=nrows))
+
+    def set_df(self, df):
+        "Display DataFrame `df`"
+        self.beginResetModel()
+        self._df = df
+        self.endResetModel()
 
     def rowCount(self, parent=QModelIndex()):
-        return len(self.df.index)
+        self.update_cache()
+        return self._shape[0]
 
     def columnCount(self, parent=QModelIndex()):
-        return len(self.df.columns.values)
+        self.update_cache()
+        return self._shape[1]
 
     def headerData(self, section, orientation, role=Qt.DisplayRole):
         if role != Qt.DisplayRole:
             return QVariant()
 
+        self.update_cache()
         if orientation == Qt.Horizontal:
             try:
-                return str(self.df.columns.tolist()[section])
+                return self._columnLabels[section]
             except (IndexError, ):
                 return QVariant()
         elif orientation == Qt.Vertical:
             try:
-                # return self.df.index.tolist()
-                return str(self.df.index.tolist()[section])
+                return self._indexLabels[section]
             except (IndexError, ):
                 return QVariant()
 
@@ -48,13 +97,11 @@ class DataFrameModel(QAbstractTableModel):
 
     def data(self, index, role=Qt.DisplayRole):
 
-        row = self.df.index[index.row()]
-        col = self.df.columns[index.column()]
-
         if not index.isValid():
             return None
         if role == Qt.DisplayRole:
-            return QVariant(str(self.df.ix[row, col]))
+            self.update_cache()
+            return QVariant(self._cells[index.row(), index.column()])
         return None
 
     def sort(self, column, order):
@@ -105,12 +152,44 @@ class ProtocoleModel(DataFrameModel):
     def __init__(self, protocole, parent = None, editable = True):
         super().__init__(parent, editable)
         self.protocole = protocole
-        self.headers = self.df.columns.tolist()
+        self.headers = self.format_columns()
+        protocole.add_listener(self.on_protocole_changed)
+
+        # volume column style
+        self.volumeFont = QFont()
+        self.volumeFont.setBold(True)
+        self.volumeBackground = QBrush(QColor(100, 200, 255, 100))
+        self.volumeForeground = QBrush(QColor(100, 200, 50))
 
     @property
     def df(self):
         return self.protocole.df
 
+    def format_cells(self):
+        return self.protocole.values.copy()
+
+    def format_columns(self):
+        return [self.protocole.col_aliases[alias] for alias in self.protocole.COLUMN_ALIASES]
+
+    def format_index(self):
+        return ["Step {}".format(step) for step in range(self.protocole.steps)]
+
+    def on_protocole_changed(self, protocole):
+        """
+        Protocole listener, notifies views of changed cells.
+        Cached cells are those last shown, so only the block of cells which differ is notified.
+        """
+        values = protocole.values
+        if not self._cacheValid or self._shape != values.shape:
+            # shape known by views is unknown or changed outside of insertRows
+            self.beginResetModel()
+            self.endResetModel()
+            return
+        changed = np.argwhere((self._cells != values) & ~(np.isnan(self._cells) & np.isnan(values)))
+        if len(changed):
+            (top, left), (bottom, right) = changed.min(axis=0), changed.max(axis=0)
+            self.dataChanged.emit(self.index(top, left), self.index(bottom, right))
+
     def flags(self,index):
         #return super().flags(index)
         flags = Qt.ItemIsSelectable
@@ -126,29 +205,18 @@ class ProtocoleModel(DataFrameModel):
         if not index.isValid():
             return None
 
-
-        row = self.df.index[index.row()]
-        col = self.df.columns[index.column()]
-
-        
-        if role == Qt.DisplayRole:
-            return QVariant(float(self.df.ix[row, col]))
-        elif role == Qt.EditRole:
-            return QVariant(float(self.df.ix[row,col]))
-        elif role == Qt.FontRole:
-            if index.column() == 0 and index.row() != 0:
-                font = QFont()
-                font.setBold(True)
-                return QVariant(font)
-        elif role == Qt.TextAlignmentRole:
-            if index.column() == 0 and index.row() != 0:
+        if role == Qt.DisplayRole or role == Qt.EditRole:
+            self.update_cache()
+            return QVariant(float(self._cells[index.row(), index.column()]))
+        elif index.column() == 0 and index.row() != 0:
+            if role == Qt.FontRole:
+                return QVariant(self.volumeFont)
+            elif role == Qt.TextAlignmentRole:
                 return Qt.AlignCenter
-        elif role == Qt.BackgroundRole:
-            if index.column() == 0 and index.row() != 0:
-                return QBrush(QColor(100, 200, 255, 100))
-        elif role == Qt.ForegroundRole:
-            if index.column() == 0 and index.row() != 0:
-                return QBrush(QColor(100, 200, 50))
+            elif role == Qt.BackgroundRole:
+                return self.volumeBackground
+            elif role == Qt.ForegroundRole:
+                return self.volumeForeground
         return None
 
     def headerData(self, section, orientation, role=Qt.DisplayRole):
@@ -164,9 +232,9 @@ class ProtocoleModel(DataFrameModel):
             except (IndexError, ):
                 return QVariant()
         elif orientation == Qt.Vertical:
+            self.update_cache()
             try:
-                # return self.df.index.tolist()
-                return "Step {}".format(self.df.index.tolist()[section])
+                return self._indexLabels[section]
             except (IndexError, ):
                 return QVariant()
 
@@ -194,22 +262,22 @@ class ProtocoleModel(DataFrameModel):
 
         if value != index.data(role):
 
-            self.modelAboutToBeReset.emit()
-
-            row = self.df.index[index.row()]
-            col = self.df.columns[index.column()]
-            #print 'before change: ', index.data().toUTC(), self.df.iloc[row][col]
-            self.protocole.update_volumes({row: value})
-            self.protocole.update()
-            #print 'after change: ', value, self._dataFrame.iloc[row][col]
-            self.modelReset.emit()
+            # views are notified of changed cells by protocole listener
+            self.protocole.update_volumes({index.row(): value})
             return True
         
         return False
 
     
     def insertRows(self, row, count, parent=QModelIndex()):
-        self.beginInsertRows(parent, self.rowCount(), self.rowCount())
-        self.protocole.add_volume(self.protocole.volumes[-1] or 1)
-        self.endInsertRows()
+        "Appends `count` steps, using last step volume. Protocole steps can only be appended."
+        if row != self.rowCount() or count < 1:
+            return False
+        # listeners are notified once rows are inserted
+        with self.protocole.batch():
+            self.beginInsertRows(parent, row, row + count - 1)
+            self.protocole.add_volumes([self.protocole.volumes[-1] or 1] * count)
+            self.endInsertRows()
+            # views know inserted rows, only their derived columns are then notified as changed
+            self.update_cache()
         return True
\ No newline at end of file
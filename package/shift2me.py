@@ -2,11 +2,15 @@ import sys
 
 import qtawesome as qta
 from PyQt5 import QtCore
-from PyQt5.QtWidgets import QAction, QApplication, QMainWindow, qApp
+from PyQt5.QtWidgets import (QAction, QApplication, QDialog, QMainWindow, QProgressBar,
+                             QToolButton, qApp)
 from PyQt5.QtGui import QStandardItemModel
 
+from package.classes.cache import ParseCache
 from package.controllers.BarChartController import BarChartController
+from package.controllers.LoadController import LoadController
 from package.controllers.ProtocoleController import ProtocoleController
+from package.controllers.WatchController import WatchController
 from package.dialogs.SetupDialog import SetupDialog
 from package.dialogs.StockDialog import StockDialog
 from package.ui.ui_mainwindow import Ui_MainWindow
@@ -40,11 +44,58 @@ class MainWindow(QMainWindow):
     def init_controllers(self):
         self.cutoffCtrl = BarChartController(self)
         self.protocoleCtrl = ProtocoleController(self)
+        self.watchCtrl = WatchController(self)
+        self.watchCtrl.titrationUpdated.connect(self.on_titration_updated)
+        # reopened directories are read from parse cache
+        self.loadCtrl = LoadController(self, cache=ParseCache())
+        self.loadCtrl.progress.connect(self.on_load_progress)
+        self.loadCtrl.loaded.connect(self.on_titration_loaded)
+        self.loadCtrl.failed.connect(self.on_load_failed)
+        self.cancelLoadBtn.clicked.connect(self.cancel_load)
+
+    def on_load_progress(self, file, done, total):
+        self.loadProgress.setMaximum(total)
+        self.loadProgress.setValue(done)
+        self.statusBar().showMessage("Loaded {file}".format(file=file))
+
+    def on_titration_loaded(self, titration, directory):
+        self.toggle_load_progress(False)
+        self.cutoffCtrl.set_titration(titration)
+        self.watchCtrl.watch(titration, directory)
+        self.statusBar().showMessage("{steps} step(s) loaded from {directory}".format(
+            steps=titration.dataSteps, directory=directory))
+
+    def on_load_failed(self, message):
+        self.toggle_load_progress(False)
+        self.statusBar().showMessage(message)
+
+    def cancel_load(self):
+        self.loadCtrl.cancel()
+        self.toggle_load_progress(False)
+        self.statusBar().showMessage("Loading cancelled")
+
+    def toggle_load_progress(self, toggle=True):
+        self.loadProgress.setValue(0)
+        self.loadProgress.setVisible(toggle)
+        self.cancelLoadBtn.setVisible(toggle)
+
+    def on_titration_updated(self, added, replaced):
+        "Extend step slider range to steps added while watching directory"
+        titration = self.watchCtrl.titration
+        if self.cutoffCtrl.titration is titration:
+            self.ui.stepSlider.setMaximum(max(titration.dataSteps - 1, 1))
+            self.cutoffCtrl.plot()
+        else:
+            self.cutoffCtrl.set_titration(titration)
+        self.statusBar().showMessage("{added} new step(s), {replaced} updated step(s)".format(
+            added=len(added), replaced=len(replaced)))
 
     def setup(self, event):
         setupDialog = SetupDialog()
         setupDialog.setModal(True)
-        setupDialog.exec()
+        if setupDialog.exec() == QDialog.Accepted and setupDialog.directory:
+            self.toggle_load_progress(True)
+            self.loadCtrl.load(setupDialog.directory)
 
     def edit_stock(self, event):
         stockDialog = StockDialog()
@@ -58,6 +109,15 @@ class MainWindow(QMainWindow):
         self.ui.analyteInitialVolume.valueChanged.connect(self.ui.totalInitialVolume.setMinimum)
         self.ui.actionStock_solutions.setIcon(qta.icon('fa.flask'))
         self.ui.manageStockBtn.setIcon(qta.icon('fa.flask'))
+        # load progress, shown while loading titration
+        self.loadProgress = QProgressBar(self)
+        self.loadProgress.setMaximumWidth(200)
+        self.cancelLoadBtn = QToolButton(self)
+        self.cancelLoadBtn.setIcon(qta.icon('fa.times'))
+        self.cancelLoadBtn.setToolTip("Cancel loading")
+        self.statusBar().addPermanentWidget(self.loadProgress)
+        self.statusBar().addPermanentWidget(self.cancelLoadBtn)
+        self.toggle_load_progress(False)
 
 
 def run():
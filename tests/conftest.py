@@ -0,0 +1,7 @@
+"""Test configuration : shell modules are imported as `classes.X`, like in the shell
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'package'))
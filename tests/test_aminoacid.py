@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from classes.Titration import Titration
+
+
+@pytest.fixture
+def titration():
+    "Three steps titration, residue 11 missing at step 1"
+    titration = Titration()
+    titration.merge_step('/data/titr0.list', (np.array([10, 11]), np.array([8.0, 8.5]), np.array([120.0, 121.0])))
+    titration.merge_step('/data/titr1.list', (np.array([10]), np.array([8.3]), np.array([120.0])))
+    titration.merge_step('/data/titr2.list', (np.array([10, 11]), np.array([8.4, 8.7]), np.array([125.0, 121.0])))
+    return titration
+
+
+def test_complete_residue_views_table(titration):
+    residue = titration.residues[10]
+    assert not hasattr(residue, '__dict__')
+    assert np.shares_memory(residue.chemshiftH, titration.table.chemshiftH)
+    assert not residue.chemshiftH.flags.writeable
+    np.testing.assert_allclose(residue.deltaChemshiftH, [0, 0.3, 0.4])
+    np.testing.assert_allclose(residue.chemshiftIntensity, titration.table.intensities[:, 0])
+    assert residue.arrow == pytest.approx((8.0, 120.0, 0.4, 5.0))
+
+
+def test_incomplete_residue_measured_steps(titration):
+    residue = titration.residues[11]
+    assert residue.chemshiftH.tolist() == [8.5, 8.7]
+    np.testing.assert_allclose(residue.chemshiftIntensity, [0, 0.2])
+    assert residue.deltaChemshifts.shape == (2, 2)
+    assert not residue.validate(3)
+
+
+def test_values_follow_table_changes(titration):
+    residue = titration.residues[10]
+    titration.table.replace_step(2, np.array([10, 11]), np.array([8.1, 8.7]), np.array([120.0, 121.0]))
+    np.testing.assert_allclose(residue.chemshiftIntensity, [0, 0.3, 0.1])
@@ -0,0 +1,39 @@
+import numpy as np
+
+from classes import cache as cacheModule
+from classes.cache import ParseCache
+
+
+CONTENT = "Assignment w1 w2\n10N-H    121.000    8.100\n"
+
+
+def test_read_uses_cache(tmp_path, monkeypatch):
+    listFile = tmp_path / 'titr0.list'
+    listFile.write_text(CONTENT)
+    cache = ParseCache(directory=str(tmp_path / 'cache'))
+    positions, chemshiftH, chemshiftN = cache.read(str(listFile))
+    assert positions.tolist() == [10] and chemshiftH.tolist() == [8.1]
+    assert len(cache.entries()) == 1
+
+    def parse(filePath):
+        raise AssertionError("cached file parsed again")
+    monkeypatch.setattr(cacheModule, 'read_list_file', parse)
+    np.testing.assert_array_equal(cache.read(str(listFile))[2], chemshiftN)
+
+
+def test_file_changed_while_parsed_is_not_cached(tmp_path, monkeypatch):
+    listFile = tmp_path / 'titr0.list'
+    listFile.write_text(CONTENT)
+    cache = ParseCache(directory=str(tmp_path / 'cache'))
+    readListFile = cacheModule.read_list_file
+
+    def parse_while_written(filePath):
+        chemshifts = readListFile(filePath)
+        with open(filePath, 'a') as fh:
+            fh.write("11N-H    122.000    8.200\n")
+        return chemshifts
+    monkeypatch.setattr(cacheModule, 'read_list_file', parse_while_written)
+    assert cache.read(str(listFile))[0].tolist() == [10]
+    assert cache.entries() == []
+    monkeypatch.undo()
+    assert cache.read(str(listFile))[0].tolist() == [10, 11]
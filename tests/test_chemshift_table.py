@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from classes.ChemshiftTable import ChemshiftTable
+
+
+def make_table():
+    "Two steps table : residue 12 missing at step 1, residue 13 only in step 1"
+    table = ChemshiftTable(capacity=1)
+    table.add_step([10, 11, 12], [8.0, 8.1, 8.2], [120.0, 121.0, 122.0])
+    table.add_step([13, 10, 11], [8.3, 8.3, 8.1], [123.0, 120.0, 126.0])
+    return table
+
+
+def test_add_step_sorts_columns_and_grows():
+    table = make_table()
+    assert table.steps == 2 and len(table) == 4
+    assert table.positions.tolist() == [10, 11, 12, 13]
+    assert table.valid.tolist() == [[True, True, True, False], [True, True, False, True]]
+    assert table.complete.tolist() == [True, True, False, False]
+    np.testing.assert_allclose(table.chemshiftH[1, :2], [8.3, 8.1])
+    assert np.isnan(table.chemshiftH[1, 2])
+
+
+def test_add_step_returns_lost_positions():
+    table = make_table()
+    lost = table.add_step([10, 12, 13], [8.0, 8.2, 8.3], [120.0, 122.0, 0.0])
+    assert lost.tolist() == [11]
+    assert table.complete.tolist() == [True, False, False, False]
+
+
+def test_intensities():
+    table = make_table()
+    intensities = table.intensities
+    np.testing.assert_allclose(intensities[1, :2], [0.3, np.hypot(0, 5.0 / 5)])
+    assert np.isnan(intensities[1, 2:]).all()
+    np.testing.assert_array_equal(table.intensity_row(-1), intensities[1])
+
+
+def test_replace_step_updates_complete_and_intensities():
+    table = make_table()
+    table.intensities
+    version = table.version
+    changed = table.replace_step(1, [10, 11, 12], [8.5, 8.1, 8.2], [120.0, 121.0, 122.0])
+    # residue 12 is complete again, residue 13 lost its only measure of step 1
+    assert changed.tolist() == [2]
+    assert table.complete.tolist() == [True, True, True, False]
+    assert table.version > version
+    np.testing.assert_allclose(table.intensities[1, :3], [0.5, 0.0, 0.0])
+
+
+def test_replace_reference_step_recomputes_all_steps():
+    table = make_table()
+    table.intensities
+    table.replace_step(0, [10, 11, 12], [8.2, 8.1, 8.2], [120.0, 121.0, 122.0])
+    np.testing.assert_allclose(table.intensities[:, 0], [0.0, 0.1])
+
+
+def test_missing_positions():
+    table = make_table()
+    table.add_positions([20])
+    assert table.missing_positions().tolist() == list(range(14, 20))
+
+
+def test_readonly_table():
+    table = make_table()
+    readonly = ChemshiftTable.from_arrays(table.positions, table.chemshiftH, table.chemshiftN,
+                                          table.valid, readonly=True)
+    np.testing.assert_array_equal(readonly.intensities, table.intensities)
+    with pytest.raises(IOError):
+        readonly.add_step([10], [8.0], [120.0])
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('cmd2')
+pytest.importorskip('tabulate')
+
+from classes.command import ShiftShell
+from classes.Titration import Titration
+
+
+@pytest.fixture
+def shell():
+    "Shell over a titration with residues 10 to 15, residue 15 missing at step 1, cut off 0.5"
+    titration = Titration(name="test")
+    positions = np.arange(10, 16, dtype=np.int64)
+    titration.merge_step('/data/titr0.list', (positions, np.full(6, 8.0), np.full(6, 120.0)))
+    titration.merge_step('/data/titr1.list', (positions[:-1], np.array([8.0, 8.2, 9.0, 8.1, 9.5]), np.full(5, 120.0)))
+    titration.set_cutoff(0.5)
+    # skip Cmd initialization, parsing only needs the titration
+    shell = ShiftShell.__new__(ShiftShell)
+    shell.titration = titration
+    return shell
+
+
+def positions(shell, expression):
+    return shell.parse_residue_set(expression.split()).positions.tolist()
+
+
+@pytest.mark.parametrize('expression, expected', [
+    ('complete & filtered', [12, 14]),
+    ('complete&filtered', [12, 14]),
+    ('filtered + 15', [12, 14, 15]),
+    ('filtered+15', [12, 14, 15]),
+    ('complete - filtered', [10, 11, 13]),
+    ('complete-filtered', [10, 11, 13]),
+    ('11:14 ^ filtered', [11, 13, 14]),
+    ('11:14^filtered', [11, 13, 14]),
+])
+def test_operators(shell, expression, expected):
+    assert positions(shell, expression) == expected
+
+
+def test_slices(shell):
+    assert positions(shell, '11:13') == [11, 12]
+    assert positions(shell, '14:') == [14, 15]
+    assert positions(shell, ':12-11') == [10]
+
+
+def test_adjacent_terms_are_united(shell):
+    assert positions(shell, '10 12 incomplete') == [10, 12, 15]
+
+
+@pytest.mark.parametrize('expression', ['- complete', 'complete -', 'complete & - filtered', 'complete-unknown'])
+def test_invalid_expressions(shell, expression):
+    with pytest.raises(ValueError):
+        shell.parse_residue_set(expression.split())
+
+
+@pytest.mark.parametrize('expression', ['99', '500:600', 'filtered'])
+def test_deselect_empty_match(shell, expression):
+    shell.titration.set_cutoff(10)
+    shell.titration.select_residues(10, 11)
+    shell.do_deselect(expression)
+    assert shell.titration.selected.positions.tolist() == [10, 11]
+
+
+def test_deselect(shell):
+    shell.titration.select_residues(10, 11, 12)
+    shell.do_deselect('11')
+    assert shell.titration.selected.positions.tolist() == [10, 12]
+    shell.do_deselect('')
+    assert shell.titration.selected.positions.tolist() == []
@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from classes.intensity import IntensityEngine
+from classes.Titration import Titration
+
+
+POSITIONS = np.array([10, 11, 12], dtype=np.int64)
+
+
+def make_titration():
+    "Two steps titration, nitrogen chem shifts changing for every residue"
+    titration = Titration(name="test")
+    titration.merge_step('/data/titr0.list', (POSITIONS, np.array([8.0, 8.1, 8.2]), np.array([120.0, 121.0, 122.0])))
+    titration.merge_step('/data/titr1.list', (POSITIONS, np.array([8.1, 8.1, 8.3]), np.array([121.0, 123.0, 122.5])))
+    return titration
+
+
+def test_engine_glycine_weight():
+    engine = IntensityEngine()
+    engine.set_glycines([11], weight=0.5)
+    assert engine.nitrogen_weight(11) == 0.5
+    assert engine.nitrogen_weight(10) == engine.nitrogenWeight
+    # changing glycine weight applies to already set glycines
+    engine.set_glycines(weight=0.1)
+    assert engine.nitrogen_weight(11) == 0.1
+    with pytest.raises(ValueError):
+        engine.set_glycines([12], weight=-1)
+
+
+def test_engine_reset_clears_glycines():
+    engine = IntensityEngine()
+    engine.set_glycines([11], weight=0.5)
+    engine.set_params(residueWeights=dict())
+    engine.set_glycines(weight=0.3)
+    assert engine.nitrogen_weight(11) == engine.nitrogenWeight
+
+
+def test_glycine_intensities_change():
+    titration = make_titration()
+    before = titration.intensities.copy()
+    titration.set_intensity_params(glycines=[11], glycineWeight=0.5)
+    after = titration.intensities
+    assert after[1, 1] == pytest.approx(np.hypot(0.0, 0.5 * 2.0))
+    assert after[1, 1] != pytest.approx(before[1, 1])
+    # non glycine residues keep default nitrogen weight
+    np.testing.assert_allclose(after[:, [0, 2]], before[:, [0, 2]])
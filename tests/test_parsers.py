@@ -0,0 +1,54 @@
+import pytest
+
+from classes.parsers import parse_list, read_list_files
+
+
+def write_files(directory, count):
+    paths = []
+    for step in range(count):
+        path = directory / 'titr{step}.list'.format(step=step)
+        path.write_text("Assignment w1 w2\n{pos}N-H    121.000    8.100\n".format(pos=step + 1))
+        paths.append(str(path))
+    return paths
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_read_list_files_order(tmp_path, jobs):
+    paths = write_files(tmp_path, 6)
+    results = list(read_list_files(paths, jobs=jobs))
+    assert [filePath for filePath, chemshifts, elapsed in results] == paths
+    assert [chemshifts[0].tolist() for filePath, chemshifts, elapsed in results] == [[pos] for pos in range(1, 7)]
+
+
+def test_read_list_files_stop_early(tmp_path):
+    paths = write_files(tmp_path, 20)
+    results = read_list_files(paths, jobs=2)
+    filePath, chemshifts, elapsed = next(results)
+    assert filePath == paths[0]
+    # closing generator cancels files which are not parsed yet
+    results.close()
+
+
+def test_parse_list():
+    positions, chemshiftH, chemshiftN = parse_list(
+        "      Assignment         w1         w2  \n\n"
+        "         10N-H    121.000      8.100 \n"
+        "            11    122.500      8.250\n")
+    assert positions.tolist() == [10, 11]
+    assert chemshiftH.tolist() == [8.1, 8.25]
+    assert chemshiftN.tolist() == [121.0, 122.5]
+
+
+def test_parse_empty_list():
+    positions, chemshiftH, chemshiftN = parse_list("Assignment w1 w2\n")
+    assert len(positions) == len(chemshiftH) == len(chemshiftN) == 0
+
+
+@pytest.mark.parametrize('line, lineNb', [
+    ("12N-H    122.000\n", 3),
+    ("12N-H    122.000    8.2.0\n", 3),
+])
+def test_parse_error_line_number(line, lineNb):
+    buffer = "Assignment w1 w2\n10N-H    121.000    8.100\n" + line + "13N-H    123.000    8.300\n"
+    with pytest.raises(ValueError, match="at line {line}$".format(line=lineNb)):
+        parse_list(buffer)
@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from classes.project import read_metadata
+from classes.Titration import Titration
+
+
+INIT = {
+    'name' : 'test',
+    'titrant' : {'name' : 'ligand', 'concentration' : 100},
+    'analyte' : {'name' : 'protein', 'concentration' : 50},
+    'start_volume' : {'analyte' : 100, 'total' : 200},
+    'add_volumes' : [0, 10, 20],
+}
+
+
+@pytest.fixture
+def titration():
+    titration = Titration(name="saved", cutoff=0.1)
+    positions = np.array([10, 11, 13], dtype=np.int64)
+    for step in range(3):
+        titration.merge_step('/data/titr{step}.list'.format(step=step),
+                             (positions, 8.0 + np.arange(3) * step / 10, np.full(3, 120.0 + step)))
+    titration.protocole.load_init_dict(INIT)
+    titration.protocole.set_headers()
+    titration.set_intensity_params(glycines=[11], glycineWeight=0.5)
+    return titration
+
+
+@pytest.mark.parametrize('mmap', [False, True])
+def test_save_load(titration, tmp_path, mmap):
+    path = str(tmp_path / 'titration.s2m')
+    titration.save(path)
+    loaded = Titration().load(path, mmap=mmap)
+
+    assert loaded.name == "saved" and loaded.cutoff == 0.1
+    assert loaded.files == titration.files
+    assert loaded.completePositions == titration.completePositions
+    np.testing.assert_array_equal(loaded.intensities, titration.intensities)
+    np.testing.assert_array_equal(loaded.protocole.values, titration.protocole.values)
+    assert loaded.protocole.col_aliases == titration.protocole.col_aliases
+    assert loaded.protocole.volumes == [0, 10, 20]
+    # loaded protocole is still editable
+    loaded.protocole.add_volume(10)
+    assert loaded.protocole.values[-1, 1] == 40
+
+
+def test_read_metadata(titration, tmp_path):
+    path = str(tmp_path / 'titration.s2m')
+    titration.save(path)
+    metadata = read_metadata(path)
+    assert metadata['name'] == "saved"
+    assert metadata['protocole']['titrant']['name'] == 'ligand'
+    assert metadata['protocole_columns'][0] == 'Added ligand (µL)'
+    assert metadata['intensity']['residueWeights'] == [[11, 0.5]]
+
+
+def test_save_load_glycines(titration, tmp_path):
+    path = str(tmp_path / 'titration.s2m')
+    titration.save(path)
+    loaded = Titration().load(path)
+    assert loaded.table.engine.glycines == {11}
+    assert loaded.table.engine.glycineWeight == 0.5
+    # glycine weight still applies to glycines of loaded project
+    loaded.set_intensity_params(glycineWeight=0.1)
+    assert loaded.table.engine.nitrogen_weight(11) == 0.1
+    assert loaded.table.engine.nitrogen_weight(10) == loaded.table.engine.nitrogenWeight
@@ -0,0 +1,73 @@
+import pytest
+
+from classes.protocole import TitrationProtocole
+from classes.Titration import Titration
+
+
+INIT = {
+    'name' : 'test',
+    'titrant' : {'name' : 'titrant', 'concentration' : 100},
+    'analyte' : {'name' : 'analyte', 'concentration' : 50},
+    'start_volume' : {'analyte' : 100, 'total' : 200},
+    'add_volumes' : [0, 10, 10, 20],
+}
+
+
+@pytest.fixture
+def protocole():
+    return TitrationProtocole(**INIT)
+
+
+def test_batch_notifies_once(protocole):
+    calls = []
+    protocole.add_listener(calls.append)
+    with protocole.batch():
+        protocole.set_initial_volume(300)
+        protocole.update_volumes({1: 5, 2: 5})
+        protocole.add_volume(10)
+    assert calls == [protocole]
+    assert protocole.volumes == [0, 5, 5, 20, 10]
+    # total volume column
+    assert protocole.values[:, 2].tolist() == [300, 305, 310, 330, 340]
+
+
+def test_load_files_notifies_once(tmp_path):
+    for step in range(3):
+        (tmp_path / 'titr{step}.list'.format(step=step)).write_text(
+            "Assignment w1 w2\n10N-H    121.000    8.{step}00\n".format(step=step))
+    titration = Titration()
+    calls = []
+    titration.protocole.add_listener(calls.append)
+    files = [str(tmp_path / 'titr{step}.list'.format(step=step)) for step in range(3)]
+    assert titration.load_files(files) == files
+    assert len(calls) == 1
+
+
+def test_failed_batch_restores_stock_solutions(protocole):
+    titrant, analyte = protocole.titrant, protocole.analyte
+    initDict = dict(INIT, titrant={'name' : 'other', 'concentration' : 10}, start_volume={'analyte' : 0, 'total' : 0})
+    with pytest.raises(ValueError):
+        with protocole.batch():
+            protocole.load_init_dict(initDict, validate=False)
+            protocole.set_analyte_volume(0)
+    assert protocole.titrant is titrant and protocole.analyte is analyte
+    assert (titrant.name, titrant.concentration) == ('titrant', 100)
+    assert (protocole.startVol, protocole.analyteStartVol) == (200, 100)
+    assert protocole.volumes == [0, 10, 10, 20]
+
+
+def test_update_volumes_invalid_step(protocole):
+    with pytest.raises(IndexError):
+        protocole.update_volumes({1: 5, 4: 5})
+    assert protocole.volumes == [0, 10, 10, 20]
+    protocole.update_volumes({-1: 5})
+    assert protocole.volumes == [0, 10, 10, 5]
+
+
+def test_set_volume_column(protocole):
+    calls = []
+    protocole.add_listener(calls.append)
+    protocole['vol_add'] = [0, 20, 20, 20]
+    assert calls == [protocole]
+    # titrant volume column is recomputed
+    assert protocole.values[:, 1].tolist() == [0, 20, 40, 60]
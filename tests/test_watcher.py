@@ -0,0 +1,56 @@
+import os
+
+from classes.Titration import Titration
+from classes.watcher import DirectoryWatcher
+
+
+def write_step(directory, step, chemshiftH=8.0):
+    path = os.path.join(str(directory), 'titr{step}.list'.format(step=step))
+    with open(path, 'w') as fh:
+        fh.write("Assignment w1 w2\n10N-H    121.000    {h:.3f}\n11N-H    122.000    8.000\n".format(h=chemshiftH))
+    return path
+
+
+def ingest(watcher, titration):
+    "Polls twice so that written files are stable, ingests and acknowledges them"
+    watcher.poll()
+    added, replaced = titration.update_files(watcher.poll())
+    watcher.acknowledge(added + replaced)
+    return added, replaced
+
+
+def test_reports_stable_files_once(tmp_path):
+    watcher = DirectoryWatcher(str(tmp_path))
+    path = write_step(tmp_path, 0)
+    assert watcher.poll() == []
+    assert watcher.pending
+    assert watcher.poll() == [path]
+    watcher.acknowledge([path])
+    assert watcher.poll() == []
+
+
+def test_early_step_is_retried(tmp_path):
+    titration = Titration()
+    titration.update_files([write_step(tmp_path, 0)])
+    watcher = DirectoryWatcher(str(tmp_path), known=titration.files)
+
+    # step 2 written before step 1 is rejected
+    early = write_step(tmp_path, 2, 8.2)
+    assert ingest(watcher, titration) == ([], [])
+    assert watcher.poll() == [early]
+
+    late = write_step(tmp_path, 1, 8.1)
+    added, replaced = ingest(watcher, titration)
+    assert added == [late, early]
+    assert titration.dataSteps == 3
+    assert watcher.poll() == []
+
+
+def test_changed_file_is_replaced(tmp_path):
+    titration = Titration()
+    titration.update_files([write_step(tmp_path, 0), write_step(tmp_path, 1)])
+    watcher = DirectoryWatcher(str(tmp_path), known=titration.files)
+    path = write_step(tmp_path, 1, 8.5)
+    os.utime(path, ns=(0, 10**9))
+    assert ingest(watcher, titration) == ([], [path])
+    assert titration.intensities[1, 0] == 0.5